@@ -0,0 +1,79 @@
+"""
+    Compare cold-start rotation baking in a single process against a pool of
+    worker processes. Runs headless from any working directory:
+
+        python benchmarks/bake_rotations.py --mod 2 --workers 1 4 16
+"""
+
+import argparse
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "source"))
+
+import pygame as pg
+
+from frame_cache import FrameCache
+
+# Cargo images and their 1920x1080 dimensions, as used by set_image_dicts
+CARGO = [
+    ("pill.png", 150, 75),
+    ("ribo.png", 90, 90),
+    ("rna.png", 75, 300),
+    ("mito.png", 300, 165),
+    ("mito.png", 150, 82),
+    ("mito.png", 75, 41),
+]
+
+
+def get_jobs(cache, mod_):
+    jobs = []
+    for file_name, x_dim, y_dim in CARGO:
+        size = (round(x_dim * mod_), round(y_dim * mod_))
+        image = pg.image.load(str(ROOT / "images" / file_name)).convert_alpha()
+        image = pg.transform.scale(image, size)
+        label = f"{Path(file_name).stem}_{size[0]}x{size[1]}"
+        jobs.append((label, cache.key(ROOT / "images" / file_name, *size), image))
+
+    return jobs
+
+
+def time_bake(workers, mod_, repeat):
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = FrameCache(cache_dir)
+            jobs = get_jobs(cache, mod_)
+            start = time.perf_counter()
+            cache.bake(jobs, workers)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mod", type=float, default=1, help="screen resolution modifier (1 for 1920x1080)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pg.init()
+    pg.display.set_mode((1, 1))
+
+    serial = None
+    for workers in args.workers:
+        elapsed = time_bake(workers, args.mod, args.repeat)
+        serial = elapsed if serial is None else serial
+        print(f"workers={workers:<3} {elapsed:8.3f} s   speedup x{serial / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
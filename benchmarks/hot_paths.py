@@ -0,0 +1,369 @@
+"""
+    Time the game's hot paths headless at several screen resolution modifiers
+    and workload sizes, optionally comparing against an earlier run:
+
+        python benchmarks/hot_paths.py --mods 0.5 1 2 --counts 35 350 3500 --output after.json
+        python benchmarks/hot_paths.py --baseline before.json
+
+    Each modifier runs in its own process, since the game's modules size
+    themselves from MOD when imported. The workload size is the number of
+    cargo for the cargo cases, of points in the stroke for the trail, of
+    particles spawned or on screen for the particle cases and of scores
+    already recorded for the score store. The first run at a new modifier
+    bakes its rotation cache.
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import math
+import os
+from pathlib import Path
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "source"))
+
+import pygame as pg
+
+DEFAULT_MODS = [0.5, 1]
+DEFAULT_COUNTS = [35, 350, 3500]
+BASE_RESOLUTION = (1920, 1080)
+AP_COUNT = 3 # Autophagosomes tested against the cargo by check_trapped
+
+
+class AlwaysFission(random.Random):
+    """ Random source that never skips the 15% fission roll. """
+
+    def randint(self, a, b):
+        return a
+
+
+def load_game(mod_):
+    """ Size the game's modules for a resolution modifier and open a matching offscreen display. """
+
+    # Game modules find their assets relative to the working directory
+    os.chdir(ROOT / "source")
+
+    import misc_functions
+    size = (round(BASE_RESOLUTION[0] * mod_), round(BASE_RESOLUTION[1] * mod_))
+    misc_functions.set_globs(w=size[0], h=size[1], m=mod_)
+
+    import assets
+    import world
+    assets.set_globs(w=size[0], h=size[1], m=mod_, d="Medium")
+    world.set_globs(w=size[0], h=size[1])
+
+    pg.init()
+    screen = pg.display.set_mode(size)
+
+    # Bake and load rotations up front so cargo cases time steady-state work
+    assets.set_image_dicts()
+
+    return screen
+
+
+def cargo_group(count, rng, vector_physics):
+    """ Group of cargo in the proportions spawned at the start of a game. """
+
+    import assets
+    import physics
+    import world
+    from spatial import SpatialHash
+
+    engine = physics.CargoPhysics(rng.randrange(2 ** 32)) if vector_physics else None
+    group = assets.CargoGroup(physics=engine, grid=SpatialHash(world.CELL_SIZE))
+    good = assets.CargoGroup()
+
+    kinds = [assets.Mitochondrion] * world.MITO_NUM + [assets.Ribosome] * world.RIBO_NUM + [assets.RNA] * world.RNA_NUM
+    for i in range(count):
+        cargo = kinds[i % len(kinds)](rng=rng)
+        group.add(cargo)
+        good.add(cargo)
+
+    group.sync()
+    return group, good
+
+
+def circle_path(center, radius, points):
+    from phagophore import PhagophorePath
+    import world
+
+    path = PhagophorePath(world.PATH_TOLERANCE)
+    for i in range(points):
+        angle = 2 * math.pi * i / points
+        path.append((round(center[0] + radius * math.cos(angle)), round(center[1] + radius * math.sin(angle))))
+
+    return path
+
+
+def autophagosome(center, radius):
+    from assets import Autophagosome
+    return Autophagosome(circle_path(center, radius, 60))
+
+
+def get_cases(screen, vector_physics):
+    """ Benchmark cases as name -> (setup(count, rng), run(state), teardown(state) or None, scaled). """
+
+    import assets
+    import world
+    from misc_functions import mod
+    from particles import ParticleSystem
+    from score_store import ScoreStore
+    from trail import TrailLayer
+
+    width, height = screen.get_size()
+
+    def setup_images(count, rng):
+        # Start from a fresh process's in-memory state with the disk cache already baked
+        assets.FRAME_PROVIDERS.clear()
+        assets.IMAGES = assets.AssetManager(assets.IMAGES.image_dir)
+        gc.collect() # Frames wrapping the mapped entries must be gone before they are unmapped
+        assets.FRAME_CACHE.close()
+
+    def setup_cargo(count, rng):
+        return cargo_group(count, rng, vector_physics)
+
+    def run_update(state):
+        group, _ = state
+        for _ in range(10):
+            group.update()
+        group.sync()
+
+    def setup_trapped(count, rng):
+        group, _ = cargo_group(count, rng, vector_physics)
+        APs = [
+            autophagosome((rng.randrange(width), rng.randrange(height)), mod(250))
+            for _ in range(AP_COUNT)
+        ]
+        return APs, group
+
+    def setup_purge(count, rng):
+        group, _ = cargo_group(count, rng, vector_physics)
+
+        # Half of the cargo has been dragged off screen inside autophagosomes
+        for sprite in group.sprites()[::2]:
+            sprite.rect.x += 2 * width
+        return group
+
+    def setup_fission(count, rng):
+        group, good = cargo_group(count, rng, vector_physics)
+        return group, good, AlwaysFission(rng.randrange(2 ** 32))
+
+    def setup_trail(count, rng):
+        layer = TrailLayer(screen.get_size(), [((218, 200, 101), mod(31), mod(60)), ((196, 143, 85), mod(11), mod(23))])
+        path = circle_path((width // 2, height // 2), min(width, height) // 3, max(count, 3))
+        return layer, path
+
+    def run_trail(state):
+        layer, path = state
+        layer.reset()
+        layer.extend(path)
+        layer.draw(screen)
+
+    def setup_particles(count, rng):
+        AP = autophagosome((width // 2, height // 2), mod(250))
+        AP.dx, AP.dy = mod(12), mod(-7)
+        AP.contents = [None] * math.ceil(count / 6)
+
+        system = ParticleSystem(seed=rng.randrange(2 ** 32), vectorized=vector_physics)
+        return world.ParticleProfile(AP, rng), system, count
+
+    def setup_particle_frames(count, rng):
+        profile, system, count = setup_particles(count, rng)
+        profile.spawn(count, system)
+        return system
+
+    def run_particle_frames(system):
+        # Move and draw a full burst for ten frames
+        for _ in range(10):
+            system.step()
+            system.draw(screen)
+
+    def setup_scores(count, rng):
+        directory = tempfile.TemporaryDirectory()
+        store = ScoreStore(Path(directory.name) / "high_scores.db")
+        with store.conn:
+            store.conn.executemany(
+                "INSERT INTO scores (score, difficulty, date) VALUES (?, ?, ?)",
+                [(rng.randrange(5000), rng.choice(["Easy", "Medium", "Hard"]), "1/1/2020") for _ in range(count)],
+            )
+        return directory, store
+
+    def run_scores(state):
+        # What end_screen does with the store: record the game and show the first page
+        _, store = state
+        store.add(1234, "Medium", "1/1/2020")
+        rows = store.ranked()
+        rows[0:10]
+        len(rows)
+
+    def teardown_scores(state):
+        directory, store = state
+        store.close()
+        directory.cleanup()
+
+    return {
+        "set_image_dicts": (setup_images, lambda state: assets.set_image_dicts(), None, False),
+        "cargo_update_x10": (setup_cargo, run_update, None, True),
+        "check_trapped": (setup_trapped, lambda state: world.check_trapped(*state), None, True),
+        "purge_cargo": (setup_purge, world.purge_cargo, None, True),
+        "fission_mito": (setup_fission, lambda state: world.fission_mito(*state), None, True),
+        "trail_stroke": (setup_trail, run_trail, None, True),
+        "particle_spawn": (setup_particles, lambda state: state[0].spawn(state[2], state[1]), None, True),
+        "particle_frame_x10": (setup_particle_frames, run_particle_frames, None, True),
+        "score_store": (setup_scores, run_scores, teardown_scores, True),
+    }
+
+
+def time_case(setup, run, teardown, count, repeat, seed):
+    """ Time run() over fresh state from setup() for each repeat. """
+
+    times = []
+    for i in range(repeat):
+        state = setup(count, random.Random(seed + i))
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+        if teardown is not None:
+            teardown(state)
+
+    return {
+        "best": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+    }
+
+
+def run_child(args):
+    """ Run every selected case for one resolution modifier, writing results to a JSON file. """
+
+    screen = load_game(args.mod)
+
+    import world
+    vector_physics = world.VECTOR_PHYSICS and not args.scalar
+
+    results = []
+    for name, (setup, run, teardown, scaled) in get_cases(screen, vector_physics).items():
+        if args.cases and name not in args.cases:
+            continue
+
+        for count in args.counts if scaled else [None]:
+            timing = time_case(setup, run, teardown, count, args.repeat, args.seed)
+            results.append({"case": name, "mod": args.mod, "count": count, "repeat": args.repeat, **timing})
+
+    with open(args.child, "w") as out_file:
+        json.dump({"vector_physics": vector_physics, "results": results}, out_file)
+
+
+def run_mods(args):
+    """ Benchmark each modifier in a fresh process. """
+
+    results = []
+    vector_physics = None
+    for mod_ in args.mods:
+        with tempfile.TemporaryDirectory() as directory:
+            out_path = Path(directory) / "results.json"
+            command = [
+                sys.executable, __file__, "--child", str(out_path), "--mod", str(mod_),
+                "--counts", *map(str, args.counts), "--repeat", str(args.repeat), "--seed", str(args.seed),
+            ]
+            command += ["--cases", *args.cases] if args.cases else []
+            command += ["--scalar"] if args.scalar else []
+            subprocess.run(command, check=True)
+
+            with open(out_path, "r") as in_file:
+                child = json.load(in_file)
+
+        vector_physics = child["vector_physics"]
+        results.extend(child["results"])
+
+    return {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pygame": pg.version.ver,
+            "platform": platform.platform(),
+            "vector_physics": vector_physics,
+        },
+        "results": results,
+    }
+
+
+def result_key(result):
+    return result["case"], result["mod"], result["count"]
+
+
+def report(results, baseline=None, threshold=0.1):
+    """ Print results, with the change from a baseline when given. Returns the number of regressions. """
+
+    previous = {result_key(result): result for result in baseline["results"]} if baseline else {}
+    regressions = 0
+
+    for result in results:
+        count = "-" if result["count"] is None else result["count"]
+        line = f"{result['case']:<18} mod={result['mod']:<5} n={count:<6} {result['best'] * 1000:10.3f} ms"
+
+        old = previous.get(result_key(result))
+        if old is not None:
+            ratio = result["best"] / old["best"] if old["best"] > 0 else float("inf")
+            line += f"   was {old['best'] * 1000:10.3f} ms   x{ratio:.2f}"
+            if ratio > 1 + threshold:
+                line += "   SLOWER"
+                regressions += 1
+            elif ratio < 1 - threshold:
+                line += "   faster"
+
+        print(line)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mods", type=float, nargs="+", default=DEFAULT_MODS, help="screen resolution modifiers (1 for 1920x1080)")
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS, help="workload sizes")
+    parser.add_argument("--cases", nargs="+", help="only run these cases")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scalar", action="store_true", help="move cargo with Cargo.update even when NumPy is installed")
+    parser.add_argument("--output", type=Path, help="write results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare against results saved by an earlier --output")
+    parser.add_argument("--threshold", type=float, default=0.1, help="fractional change reported as faster or slower")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--mod", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    results = run_mods(args)
+
+    if args.output is not None:
+        with open(args.output, "w") as out_file:
+            json.dump(results, out_file, indent=4)
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, "r") as in_file:
+            baseline = json.load(in_file)
+
+    regressions = report(results["results"], baseline, args.threshold)
+    if regressions:
+        sys.exit(f"{regressions} case(s) slower than the baseline")
+
+
+if __name__ == "__main__":
+    main()
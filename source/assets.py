@@ -1,11 +1,14 @@
+from collections import Counter, namedtuple, OrderedDict
 import math
 from pathlib import Path
 import random
 import statistics as stats
+import time
 
 import pygame as pg
 
-from misc_functions import get_distance, in_bounds, mod, get_delta_length
+from frame_cache import FrameCache
+from misc_functions import in_bounds, mod, get_delta_length
 
 # Define working directory
 DIR_PATH = Path.cwd().parent
@@ -25,7 +28,6 @@ DIFFICULTY = None
 PILL_IMAGES = {}
 RIBO_IMAGES = {}
 RNA_IMAGES = {}
-PARTICLE_IMAGES = {}
 MITO_LARGE_IMAGES = {}
 MITO_MED_IMAGES = {}
 MITO_SMALL_IMAGES = {}
@@ -35,38 +37,381 @@ SPEED_SCALAR = {"Easy": 0.5, "Medium": 1, "Hard": 1.7}
 SCORE_SCALAR = {"Easy": 1, "Medium": 2, "Hard": 3}
 
 ANGLE_LIST = [-5, -4, -3, -2, -1, 1, 2, 3, 4, 5]
+ANGLE_STEP = 1 # Degrees between the rotations cargo is drawn at; coarser steps need fewer distinct frames
+
+
+
+class AssetManager:
+    """
+        Process-wide image store. Each file is decoded once per conversion
+        mode and each (file, size, conversion mode, colorkey) combination is
+        scaled once; returned surfaces are shared and must not be modified.
+    """
+
+    def __init__(self, image_dir):
+        self.image_dir = Path(image_dir)
+        self._decoded = {}
+        self._surfaces = {}
+        self.decodes = Counter()
+        self.decode_time = 0.0
+        self.hits = 0
+
+    def load(self, file_name, size=None, mode="convert_alpha", colorkey=None, keep=True):
+        """ Get image scaled to size (None for native size). """
+
+        key = (file_name, size, mode, colorkey)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+
+        image = self._decode(file_name, mode)
+        surface = image if size is None else pg.transform.scale(image, size)
+        if colorkey is not None:
+            if surface is image:
+                surface = image.copy()
+            surface.set_colorkey(colorkey)
+
+        if keep:
+            self._surfaces[key] = surface
+
+        return surface
+
+    def _decode(self, file_name, mode):
+        key = (file_name, mode)
+        image = self._decoded.get(key)
+        if image is None:
+            start = time.perf_counter()
+            image = pg.image.load(str(self.image_dir / file_name))
+
+            # Conversion needs a display mode; simulations without one keep the decoded format
+            if pg.display.get_surface() is not None:
+                if mode == "convert_alpha":
+                    image = image.convert_alpha()
+                elif mode == "convert":
+                    image = image.convert()
+            self.decode_time += time.perf_counter() - start
+            self.decodes[file_name] += 1
+            self._decoded[key] = image
+
+        return image
+
+    def stats(self):
+        return {
+            "decodes": sum(self.decodes.values()),
+            "decodes_by_file": dict(self.decodes),
+            "decode_time": round(self.decode_time, 4),
+            "hits": self.hits,
+            "cached_surfaces": len(self._surfaces),
+        }
+
+
+IMAGES = AssetManager(DIR_PATH / "images")
+
+# Autophagosome images are cached in geometric size steps so forming an AP never scales on the fly
+AP_BUCKET_RATIO = 1.1
+AP_IMAGES = {}
+
+# Rotated cargo frames are baked once and reused across games and launches
+FRAME_CACHE = FrameCache(DIR_PATH / "cache")
+FRAME_BUDGET = 32 * 1024 * 1024 # Bytes of rotated frames kept resident per cargo type
+BAKE_WORKERS = None # Processes used to bake missing rotations (None for one per core)
+
+
+# Drawing information for a single rotation: the surface to blit from, the
+# offset of the drawn area within the untrimmed frame, the area of the source
+# surface to draw (None for all of it) and the untrimmed frame size
+Frame = namedtuple("Frame", ["image", "source", "offset", "area", "size"])
+
+FRAME_PROVIDERS = {}
+
+
+def rotated_size(width, height, angle):
+    """ Size of the surface pg.transform.rotozoom returns for an image rotated to angle, without rotating it. """
+
+    # Unrotated images come back as they are
+    if angle % 360 == 0:
+        return width, height
+
+    # Same bounds as pygame's rotozoom, which halves the source size in integers
+    radians = math.radians(angle)
+    cos, sin = math.cos(radians), math.sin(radians)
+    x, y = width // 2, height // 2
+    half_w = max(math.ceil(max(abs(cos * x + sin * y), abs(cos * x - sin * y))), 1)
+    half_h = max(math.ceil(max(abs(sin * x + cos * y), abs(sin * x - cos * y))), 1)
+    return 2 * half_w, 2 * half_h
+
+
+def draw_angle(angle):
+    """ Rotation that cargo turned to angle is drawn at. """
+
+    return angle - angle % ANGLE_STEP
+
+
+class RotationFrames:
+    """
+        Angle-indexed provider of rotated cargo frames. Frames are rendered on
+        first use and the least recently used ones are evicted once the
+        resident size exceeds the byte budget (None for no limit).
+    """
+
+    def __init__(self, render, budget=None, sizes=None):
+        self.render = render
+        self.budget = budget
+        self._sizes = sizes
+        self.frames = OrderedDict()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, angle):
+        return self.frame(angle).image
+
+    def frame(self, angle):
+        angle %= 360
+
+        frame = self.frames.get(angle)
+        if frame is not None:
+            self.hits += 1
+            self.frames.move_to_end(angle)
+            return frame
+
+        self.misses += 1
+        image = self.render(angle)
+        image.set_colorkey(BLACK)
+        frame = Frame(image, image, (0, 0), None, image.get_size())
+        self.frames[angle] = frame
+        self.resident_bytes += image.get_width() * image.get_height() * image.get_bytesize()
+
+        # Evict least recently used frames, always keeping the one just rendered
+        while self.budget is not None and self.resident_bytes > self.budget and len(self.frames) > 1:
+            _, old_frame = self.frames.popitem(last=False)
+            old_image = old_frame.image
+            self.resident_bytes -= old_image.get_width() * old_image.get_height() * old_image.get_bytesize()
+
+        return frame
+
+    @property
+    def sizes(self):
+        """ Untrimmed size of every rotation, rendering them once if not known up front. """
+
+        if self._sizes is None:
+            self._sizes = [self.frame(angle).size for angle in range(360)]
+        return self._sizes
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "resident_frames": len(self.frames),
+            "resident_bytes": self.resident_bytes,
+        }
+
+
+class FrameAtlas:
+    """
+        All rotated frames of a cargo type packed into one surface. Each angle
+        maps to a trimmed subrect of the atlas plus the offset of that subrect
+        within the untrimmed rotated frame.
+    """
+
+    def __init__(self, surface, rects, offsets, sizes):
+        self.surface = surface
+        self.rects = rects
+        self.offsets = offsets
+        self.sizes = sizes
+        self.frames = [
+            Frame(surface.subsurface(rect), surface, offset, rect, size)
+            for rect, offset, size in zip(rects, offsets, sizes)
+        ]
+        self.hits = 0
+        self.misses = 0 # Every frame is resident, so no lookup misses
+
+    def __getitem__(self, angle):
+        return self.frame(angle).image
+
+    def frame(self, angle):
+        self.hits += 1
+        return self.frames[angle % 360]
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "resident_frames": len(self.frames),
+            "resident_bytes": self.surface.get_width() * self.surface.get_height() * self.surface.get_bytesize(),
+        }
+
+
+def build_atlas(render, count=360):
+    """ Trim each rotated frame to its visible bounds and shelf-pack them into a single surface. """
+
+    frames = [render(angle) for angle in range(count)]
+    bounds = [frame.get_bounding_rect() for frame in frames]
+
+    # Keep the atlas as narrow as the widest frame so each frame's rows stay close together
+    atlas_w = max(rect.w for rect in bounds)
+
+    # Place frames from tallest to shortest, opening a new shelf when a row fills up
+    positions = [None] * count
+    x, y, shelf_h = 0, 0, 0
+    for angle in sorted(range(count), key=lambda i: bounds[i].h, reverse=True):
+        rect = bounds[angle]
+        if x + rect.w > atlas_w:
+            x, y, shelf_h = 0, y + shelf_h, 0
+        positions[angle] = (x, y)
+        x += rect.w
+        shelf_h = max(shelf_h, rect.h)
+
+    surface = pg.Surface((atlas_w, max(1, y + shelf_h)), pg.SRCALPHA)
+
+    rects, offsets, sizes = [], [], []
+    for angle, frame in enumerate(frames):
+        rect = pg.Rect(positions[angle], bounds[angle].size)
+        # Copy pixels exactly rather than alpha blending onto the empty atlas
+        surface.blit(frame, rect, bounds[angle], special_flags=pg.BLEND_RGBA_MAX)
+        rects.append(rect)
+        offsets.append(bounds[angle].topleft)
+        sizes.append(frame.get_size())
+
+    surface.set_colorkey(BLACK)
+
+    return FrameAtlas(surface, rects, offsets, sizes)
+
+
+def frame_stats():
+    """ Report frame provider usage for each cargo type. """
+
+    providers = {
+        "pill": PILL_IMAGES,
+        "ribo": RIBO_IMAGES,
+        "rna": RNA_IMAGES,
+        "mito_large": MITO_LARGE_IMAGES,
+        "mito_med": MITO_MED_IMAGES,
+        "mito_small": MITO_SMALL_IMAGES,
+    }
+
+    return {name: provider.stats() for name, provider in providers.items() if hasattr(provider, "stats")}
+
 
 def set_image_dicts():
-    def get_images(cargo):
-        image = pg.image.load(str(DIR_PATH / "images" / cargo.file_name)).convert_alpha()
-        image = pg.transform.scale(image, (int(cargo.x_dim), int(cargo.y_dim)))
-        image_dict = {}
+    def describe(cargo):
+        size = (int(cargo.x_dim), int(cargo.y_dim))
+        label = f"{Path(cargo.file_name).stem}_{size[0]}x{size[1]}"
+        key = FRAME_CACHE.key(DIR_PATH / "images" / cargo.file_name, *size)
+        return cargo.file_name, size, label, key
+
+    def get_images(file_name, size, label, key):
+        # Reuse providers from earlier games
+        if (label, key, FRAME_BUDGET) in FRAME_PROVIDERS:
+            return FRAME_PROVIDERS[(label, key, FRAME_BUDGET)]
+
+        cached = FRAME_CACHE.load(label, key)
+
+        if cached is not None:
+            render = cached.__getitem__
+            sizes = [cached.size(angle) for angle in range(len(cached))]
+            frame_bytes = sum(w * h * 4 for w, h in sizes)
+        # Cache could not be written; rotate frames on demand for this session
+        else:
+            image = IMAGES.load(file_name, size)
+            render = lambda angle: pg.transform.rotozoom(image, angle, 1)
+            sizes = [rotated_size(*image.get_size(), angle) for angle in range(360)]
+            frame_bytes = None
+
+        # Pack the full rotation set into an atlas when it fits within the budget
+        if FRAME_BUDGET is None or (frame_bytes is not None and frame_bytes <= FRAME_BUDGET):
+            provider = build_atlas(render)
+        else:
+            provider = RotationFrames(render, FRAME_BUDGET, sizes)
 
-        for angle in range(0, 360):
-            rotated_surface = pg.transform.rotozoom(image, angle, 1)
-            rotated_surface.set_colorkey(BLACK)
-            image_dict[angle] = rotated_surface
+        # Providers from an outdated cache entry are no longer needed
+        for stale in [k for k in FRAME_PROVIDERS if k[0] == label]:
+            del FRAME_PROVIDERS[stale]
+        FRAME_PROVIDERS[(label, key, FRAME_BUDGET)] = provider
 
-        return image_dict
+        return provider
 
     global PILL_IMAGES
     global RIBO_IMAGES
     global RNA_IMAGES
-    global PARTICLE_IMAGES
     global MITO_LARGE_IMAGES
     global MITO_MED_IMAGES
     global MITO_SMALL_IMAGES
 
+    _mito = Mitochondrion()
+    entries = [
+        describe(Pill()),
+        describe(Ribosome()),
+        describe(RNA()),
+        describe(Mitochondrion()),
+        describe(Mitochondrion(x_dim=_mito.image_static.get_width()/2, y_dim=_mito.image_static.get_height()/2)),
+        describe(Mitochondrion(x_dim=_mito.image_static.get_width()/4, y_dim=_mito.image_static.get_height()/4)),
+    ]
 
-    PILL_IMAGES = get_images(Pill())
-    RIBO_IMAGES = get_images(Ribosome())
-    RNA_IMAGES = get_images(RNA())
-    PARTICLE_IMAGES = get_images(Particle())
+    # Bake all missing rotation sets together so the work is spread over every core
+    missing = [
+        (label, key, IMAGES.load(file_name, size))
+        for file_name, size, label, key in entries
+        if (label, key, FRAME_BUDGET) not in FRAME_PROVIDERS and FRAME_CACHE.load(label, key) is None
+    ]
+    if missing:
+        try:
+            FRAME_CACHE.bake(missing, BAKE_WORKERS)
+        except OSError:
+            pass # Read-only install
+
+    (
+        PILL_IMAGES,
+        RIBO_IMAGES,
+        RNA_IMAGES,
+        MITO_LARGE_IMAGES,
+        MITO_MED_IMAGES,
+        MITO_SMALL_IMAGES,
+    ) = [get_images(*entry) for entry in entries]
+
+
+def AP_bucket(radius):
+    """ Quantize AP radius to the index of its geometric size bucket. """
+
+    return round(math.log(max(radius, 1)) / math.log(AP_BUCKET_RATIO))
+
+
+def get_AP_image(radius):
+    """ Get pre-scaled AP image for the size bucket containing radius. """
+
+    bucket = AP_bucket(radius)
+    image = AP_IMAGES.get(bucket)
+
+    if image is None:
+        AP_dim = round(((AP_BUCKET_RATIO ** bucket) * 2) * 1.2)
+        image = IMAGES.load("AP.png", (AP_dim, AP_dim), "convert", BLACK, keep=False)
+        AP_IMAGES[bucket] = image
+
+    return image
 
-    _mito = Mitochondrion()
-    MITO_LARGE_IMAGES = get_images(Mitochondrion())
-    MITO_MED_IMAGES = get_images(Mitochondrion(x_dim=_mito.image_static.get_width()/2, y_dim=_mito.image_static.get_height()/2))
-    MITO_SMALL_IMAGES = get_images(Mitochondrion(x_dim=_mito.image_static.get_width()/4, y_dim=_mito.image_static.get_height()/4))
+
+def warm_AP_images(min_area):
+    """ Pre-scale AP images for every radius from the smallest valid AP to one drawn around the whole screen. """
+
+    # An AP's radius comes from the area of its stroke's bounding box, at most the whole screen
+    min_radius = ((min_area / math.pi) ** 0.5) / 2
+    max_radius = ((WIDTH * HEIGHT) ** 0.5) / 2
+
+    for bucket in range(AP_bucket(min_radius), AP_bucket(max_radius) + 1):
+        get_AP_image(AP_BUCKET_RATIO ** bucket)
 
 
 class Autophagosome(pg.sprite.Sprite):
@@ -78,13 +423,12 @@ class Autophagosome(pg.sprite.Sprite):
     def __init__(self, phago_locs):
         super().__init__()
 
-        # Collect x and y coordinates of precursor phagophore
-        xs = sorted([xy[0] for xy in phago_locs])
-        ys = sorted([xy[1] for xy in phago_locs])
+        # Extent of precursor phagophore
+        left, top, right, bottom = phago_locs.bounds
 
         # Get radius of ellipse drawn by user
-        x_rad = (xs[-1] - xs[0])
-        y_rad = (ys[-1] - ys[0])
+        x_rad = (right - left)
+        y_rad = (bottom - top)
         self.area = (x_rad * y_rad * math.pi)
 
         # Calculate radius of circle with same radius
@@ -92,14 +436,11 @@ class Autophagosome(pg.sprite.Sprite):
         self.radius = round(rad)
 
         # Establish appearance of AP
-        AP_dim = round((self.radius * 2) * 1.2)
-        self.image = pg.image.load(str(DIR_PATH / "images" / "AP.png")).convert()
-        self.image = pg.transform.scale(self.image, (AP_dim, AP_dim))
-        self.image.set_colorkey(BLACK)
+        self.image = get_AP_image(self.radius)
         self.rect = self.image.get_rect()
 
         # Initalize location
-        self.rect.center = (round(stats.mean([min(xs), max(xs)])), round(stats.mean([min(ys), max(ys)])))
+        self.rect.center = (round(stats.mean([left, right])), round(stats.mean([top, bottom])))
 
         self.dx = 0
         self.dy = 0
@@ -107,35 +448,38 @@ class Autophagosome(pg.sprite.Sprite):
         self.contents = []
 
 
-    def handle_event(self, event, prev_loc, cur_loc):
+    def handle_event(self, mouse_down, prev_loc, cur_loc):
         """ Respond to player mouse dragging by accelerating AP. """
 
-        if pg.mouse.get_pressed()[0]:
+        if mouse_down:
             # See if click is within AP
-            distance = get_distance(self.rect.center, cur_loc)
-            if distance < self.radius:
+            x, y = self.rect.center
+            if (cur_loc[0] - x) ** 2 + (cur_loc[1] - y) ** 2 < self.radius ** 2:
                 # Update velocities
                 dx = (cur_loc[0] - prev_loc[0])
                 dy = (cur_loc[1] - prev_loc[1])
                 self.dx, self.dy = dx, dy
 
 
-    def update(self, screen):
+    def update(self):
         """ Update AP position. """
 
         self.rect.move_ip(self.dx, self.dy)
         
         # Update content positions
         for item in self.contents:
+            item.prev_center = item.rect.center
             item.rect.move_ip(self.dx, self.dy)
 
         # Delete AP if off screen
         if not in_bounds(WIDTH, HEIGHT, self, buffer=100):
             self.kill()
     
-    def draw(self, screen):
-        """ Blit the AP. """
-        screen.blit(self.image, self.rect)
+    def draw(self, screen, alpha=1):
+        """ Blit the AP alpha of the way through its last step. """
+
+        back = 1 - alpha
+        return screen.blit(self.image, self.rect.move(-round(self.dx * back), -round(self.dy * back)))
 
 
 class Cargo(pg.sprite.Sprite):
@@ -157,43 +501,45 @@ class Cargo(pg.sprite.Sprite):
         dy=None, 
         adjust_box=False, 
         scale_score=True,
-        bound=True
+        bound=True,
+        rng=None
         ):
 
         self.file_name = file_name
         self.image_dict = image_dict
         self.x_dim = x_dim
         self.y_dim = y_dim
+        self.rng = rng if rng is not None else random
 
         super().__init__()
 
         # Esablish appearance
-        self.image = pg.image.load(str(DIR_PATH / "images" / file_name)).convert_alpha()
-        self.image = pg.transform.scale(self.image, (round(x_dim), round(y_dim)))
+        self.image = IMAGES.load(file_name, (round(x_dim), round(y_dim)), colorkey=WHITE)
 
-        self.image.set_colorkey(WHITE)
         self.image_static = self.image
         self.rect = self.image.get_rect()
+        self.frame = None
 
         # Initialize positions, velocites and angles
         self.dx_cap = round(x_speed_cap * SPEED_SCALAR[DIFFICULTY])
         self.dy_cap = round(y_speed_cap * SPEED_SCALAR[DIFFICULTY])
 
-        self.angle = random.randrange(0, 360)
+        self.angle = self.rng.randrange(0, 360)
         self.angle_rate = 0
         while self.angle_rate == 0:
-            self.angle_rate=random.randrange(-5, 5)
+            self.angle_rate=self.rng.randrange(-5, 5)
 
-        self.rect.x = x if x is not None else random.randrange(0, WIDTH)
-        self.rect.y = y if y is not None else random.randrange(0, HEIGHT)
+        self.rect.x = x if x is not None else self.rng.randrange(0, WIDTH)
+        self.rect.y = y if y is not None else self.rng.randrange(0, HEIGHT)
 
         self.dx, self.dy = 0, 0
         while 0 in [self.dx, self.dy]:
-            self.dx = dx if dx is not None else random.randrange(-self.dx_cap, self.dx_cap + 1)
-            self.dy = dy if dy is not None else random.randrange(-self.dy_cap, self.dy_cap + 1)
+            self.dx = dx if dx is not None else self.rng.randrange(-self.dx_cap, self.dx_cap + 1)
+            self.dy = dy if dy is not None else self.rng.randrange(-self.dy_cap, self.dy_cap + 1)
 
         self.trapped = False
         self.score_val = score_val * SCORE_SCALAR[DIFFICULTY] if scale_score else score_val
+        self.prev_center = None # Center before the last step, for drawing between steps
 
         self.adjust_box = adjust_box
         self.bound = bound
@@ -205,6 +551,7 @@ class Cargo(pg.sprite.Sprite):
         if not self.trapped:
             # Save information on original rectangle
             old_rect = self.rect
+            self.prev_center = self.rect.center
 
             # Update position
             self.rect.move_ip(self.dx, self.dy)
@@ -218,7 +565,7 @@ class Cargo(pg.sprite.Sprite):
                 bottom = self.rect.bottom if not self.adjust_box else self.rect.bottom - delta
 
                 # Constrain to screen and flip velocities
-                rand_angle = random.choice(ANGLE_LIST)
+                rand_angle = self.rng.choice(ANGLE_LIST)
 
                 if left < 0:
                     self.rect.left = 0 - delta
@@ -239,15 +586,104 @@ class Cargo(pg.sprite.Sprite):
 
                 # Update angle and rotate cargo
                 self.angle = (self.angle + self.angle_rate) % 360
-                self.image = self.image_dict[self.angle]
+                self.frame = self.image_dict.frame(draw_angle(self.angle))
+                self.image = self.frame.image
 
-            self.rect = self.image.get_rect()
+            # Size the box by the true angle, whichever rotation is drawn
+            self.rect = pg.Rect((0, 0), self.image_dict.sizes[self.angle]) if self.frame is not None else self.image.get_rect()
 
             # Determine new x, y coordinates and move cargo
             new_x = old_rect.x + ((old_rect.width - self.rect.width) / 2) + self.dx
             new_y = old_rect.y + ((old_rect.height - self.rect.height) / 2) + self.dy
             self.rect.move_ip(new_x, new_y)    
 
+    def draw_offset(self, alpha):
+        """ Offset from the current rect to where the sprite was alpha of the way through its last step. """
+
+        if alpha >= 1 or self.prev_center is None:
+            return 0, 0
+
+        x, y = self.rect.center
+        prev_x, prev_y = self.prev_center
+        return round((prev_x - x) * (1 - alpha)), round((prev_y - y) * (1 - alpha))
+
+    def blit_args(self, offset=(0, 0)):
+        """ Get source, destination and area for drawing the current frame. """
+
+        if self.frame is None:
+            return self.image, self.rect.move(offset)
+
+        # Center the frame in the box, since it may be drawn at a coarser rotation than the box was sized for
+        x_offset = self.frame.offset[0] + (self.rect.width - self.frame.size[0]) // 2
+        y_offset = self.frame.offset[1] + (self.rect.height - self.frame.size[1]) // 2
+        return self.frame.source, (self.rect.x + x_offset + offset[0], self.rect.y + y_offset + offset[1]), self.frame.area
+
+
+class CargoGroup(pg.sprite.Group):
+    """
+        Sprite group that draws cargo straight from their frame atlases in a single batch.
+        Given a physics engine, members are moved by the engine rather than Cargo.update.
+        Given a spatial hash, members are kept filed in it by position for near().
+    """
+
+    def __init__(self, *sprites, physics=None, grid=None):
+        self.physics = physics
+        self.grid = grid
+        if physics is not None:
+            physics.grid = grid
+
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, *args):
+        super().add_internal(sprite, *args)
+        if self.grid is not None:
+            self.grid.insert(sprite, sprite.rect)
+        if self.physics is not None:
+            self.physics.add(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        if self.grid is not None:
+            self.grid.remove(sprite)
+        if self.physics is not None:
+            self.physics.remove(sprite)
+
+    def update(self, *args, **kwargs):
+        if self.physics is not None:
+            self.physics.step()
+            return
+
+        super().update(*args, **kwargs)
+        if self.grid is not None:
+            for sprite in self.sprites():
+                self.grid.insert(sprite, sprite.rect)
+
+    def sync(self):
+        """ Bring sprite rects up to date with the physics engine. """
+
+        if self.physics is not None:
+            self.physics.sync()
+
+    def near(self, center, radius):
+        """ Members that may lie within radius of center. """
+
+        if self.grid is None:
+            return self.sprites()
+
+        return self.grid.query_circle(center, radius)
+
+    def draw(self, surface, alpha=1):
+        """ Draw members alpha of the way from their previous to their current positions. """
+
+        if self.physics is not None:
+            blits = []
+            self.physics.sync(blits, alpha)
+        else:
+            blits = [sprite.blit_args(sprite.draw_offset(alpha)) for sprite in self.sprites()]
+
+        return surface.blits(blits)
+
+
 class Mitochondrion(Cargo):
     def __init__(
         self, 
@@ -263,13 +699,14 @@ class Mitochondrion(Cargo):
         dx=None, 
         dy=None,
         adjust_box=True,
-        scale_score=True
+        scale_score=True,
+        rng=None
     ):
         # Mutable defaults are the source of all evil
         if image_dict is None:
             image_dict = MITO_LARGE_IMAGES
 
-        super().__init__(file_name, image_dict, x_dim, y_dim, score_val, x_speed_cap, y_speed_cap, x, y, dx, dy, adjust_box, scale_score)
+        super().__init__(file_name, image_dict, x_dim, y_dim, score_val, x_speed_cap, y_speed_cap, x, y, dx, dy, adjust_box, scale_score, rng=rng)
 
 class Ribosome(Cargo):
     def __init__(
@@ -285,13 +722,14 @@ class Ribosome(Cargo):
         y=None, 
         dx=None, 
         dy=None,
-        adjust_box=False
+        adjust_box=False,
+        rng=None
     ):
         # Mutable defaults are the source of all evil
         if image_dict is None:
             image_dict = RIBO_IMAGES
 
-        super().__init__(file_name, image_dict, x_dim, y_dim, score_val, x_speed_cap, y_speed_cap, x, y, dx, dy, adjust_box)
+        super().__init__(file_name, image_dict, x_dim, y_dim, score_val, x_speed_cap, y_speed_cap, x, y, dx, dy, adjust_box, rng=rng)
 
 
 class RNA(Cargo):
@@ -308,13 +746,14 @@ class RNA(Cargo):
         y=None, 
         dx=None, 
         dy=None,
-        adjust_box=False        
+        adjust_box=False,
+        rng=None
     ):
         # Mutable defaults are the source of all evil
         if image_dict is None:
             image_dict = RNA_IMAGES
 
-        super().__init__(file_name, image_dict, x_dim, y_dim, score_val, x_speed_cap, y_speed_cap, x, y, dx, dy, adjust_box)
+        super().__init__(file_name, image_dict, x_dim, y_dim, score_val, x_speed_cap, y_speed_cap, x, y, dx, dy, adjust_box, rng=rng)
 
 
 class Pill(Cargo):
@@ -331,38 +770,15 @@ class Pill(Cargo):
         y=None, 
         dx=None, 
         dy=None,
-        adjust_box=False
-    ):
-
-        # Mutable defaults are the source of all evil
-        if image_dict is None:
-            image_dict = PILL_IMAGES
-
-        super().__init__(file_name, image_dict, x_dim, y_dim, score_val, x_speed_cap, y_speed_cap, x, y, dx, dy, adjust_box)
-
-class Particle(Cargo):
-    def __init__(
-        self, 
-        file_name="particle.png", 
-        image_dict=None,
-        x_dim=mod(30), 
-        y_dim=mod(30), 
-        score_val=10, 
-        x_speed_cap=mod(4), 
-        y_speed_cap=mod(4), 
-        x=None, 
-        y=None, 
-        dx=None, 
-        dy=None,
         adjust_box=False,
-        bound=False
+        rng=None
     ):
 
         # Mutable defaults are the source of all evil
         if image_dict is None:
-            image_dict = PARTICLE_IMAGES
+            image_dict = PILL_IMAGES
 
-        super().__init__(file_name, image_dict, x_dim, y_dim, score_val, x_speed_cap, y_speed_cap, x, y, dx, dy, adjust_box, bound=bound)
+        super().__init__(file_name, image_dict, x_dim, y_dim, score_val, x_speed_cap, y_speed_cap, x, y, dx, dy, adjust_box, rng=rng)
 
 
 class Button:
@@ -382,12 +798,8 @@ class Button:
         self.active = False
     
         # Initialize image
-        base_up = pg.image.load(str(DIR_PATH / "images" / "button_up.png")).convert()
-        base_down = pg.image.load(str(DIR_PATH / "images" / "button_down.png")).convert()
-        self.image_up = pg.transform.scale(base_up, (w, h))
-        self.image_down = pg.transform.scale(base_down, (w, h))
-        self.image_up.set_colorkey(BLACK)
-        self.image_down.set_colorkey(BLACK)
+        self.image_up = IMAGES.load("button_up.png", (w, h), "convert", BLACK)
+        self.image_down = IMAGES.load("button_down.png", (w, h), "convert", BLACK)
 
     def handle_event(self, event, glob_diff=None):
         """ Detect button click and respond accordingly. """
@@ -433,14 +845,16 @@ class Button:
         screen.blit(self.txt_surface, (text_x, text_y+delta))
         
 
-def set_globs(w=None, h=None, m=None, d=None):
+def set_globs(w=None, h=None, m=None, d=None, b=None):
     global WIDTH
     global HEIGHT
     global MOD
     global DIFFICULTY
+    global FRAME_BUDGET
 
 
     WIDTH = WIDTH if w is None else w
     HEIGHT = HEIGHT if h is None else h
     MOD = MOD if m is None else m
-    DIFFICULTY = DIFFICULTY if d is None else d
\ No newline at end of file
+    DIFFICULTY = DIFFICULTY if d is None else d
+    FRAME_BUDGET = FRAME_BUDGET if b is None else b
\ No newline at end of file
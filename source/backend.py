@@ -0,0 +1,122 @@
+import argparse
+import os
+import sys
+
+import pygame as pg
+
+# Environment variables mirroring the command line flags
+HEADLESS_ENV = "GAMEOPHAGY_HEADLESS"
+RESOLUTION_ENV = "GAMEOPHAGY_RESOLUTION"
+DRIVER_ENV = "GAMEOPHAGY_VIDEO_DRIVER"
+
+DEFAULT_RESOLUTION = (1920, 1080)
+
+
+def parse_resolution(text):
+    """ Parse resolution of the form WIDTHxHEIGHT. """
+
+    try:
+        width, height = (int(val) for val in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid resolution '{text}', expected WIDTHxHEIGHT")
+
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"invalid resolution '{text}'")
+
+    return width, height
+
+
+def native_resolution():
+    """ Determine the resolution of the primary display. """
+
+    # Keep the system metrics used by the original Windows build, which ignore DPI scaling
+    if sys.platform == "win32":
+        import ctypes
+        return ctypes.windll.user32.GetSystemMetrics(0), ctypes.windll.user32.GetSystemMetrics(1)
+
+    pg.display.init()
+    try:
+        return pg.display.get_desktop_sizes()[0]
+    except (AttributeError, IndexError): # pygame 1.9 or no display attached
+        info = pg.display.Info()
+        if info.current_w > 0 and info.current_h > 0:
+            return info.current_w, info.current_h
+
+    return DEFAULT_RESOLUTION
+
+
+class DisplayBackend:
+    """
+        Fullscreen on the native display when the requested size matches it,
+        otherwise a window of exactly the requested size, since the game is
+        laid out and simulated for that size.
+    """
+
+    headless = False
+
+    def __init__(self, size=None):
+        self.size = size if size is not None else native_resolution()
+
+    def open(self, caption):
+        """ Initialize pygame and create the screen surface. """
+
+        pg.init()
+        pg.display.set_caption(caption)
+        screen = pg.display.set_mode(self.size)
+        if tuple(self.size) != tuple(native_resolution()):
+            return screen
+
+        try:
+            screen = pg.display.set_mode((0, 0), pg.FULLSCREEN)
+        except pg.error: # Error sometimes encountered with 4K displays
+            return pg.display.set_mode(self.size)
+
+        # Desktop size may differ from the measured one, e.g. with display scaling
+        if screen.get_size() != tuple(self.size):
+            screen = pg.display.set_mode(self.size)
+
+        return screen
+
+
+class HeadlessBackend(DisplayBackend):
+    """ Offscreen rendering through one of SDL's windowless video drivers. """
+
+    headless = True
+
+    def __init__(self, size=None, driver="dummy"):
+        # SDL reads the drivers when the display is initialized, so set them first
+        os.environ["SDL_VIDEODRIVER"] = driver
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+        self.size = size if size is not None else DEFAULT_RESOLUTION
+
+    def open(self, caption):
+        pg.init()
+        pg.display.set_caption(caption)
+        return pg.display.set_mode(self.size)
+
+
+def add_arguments(parser):
+    """ Add display backend flags to an argument parser. """
+
+    parser.add_argument(
+        "--headless", action="store_true", default=os.environ.get(HEADLESS_ENV, "") not in ("", "0"),
+        help=f"render offscreen without opening a window (or set {HEADLESS_ENV}=1)"
+    )
+    parser.add_argument(
+        "--resolution", type=parse_resolution, default=os.environ.get(RESOLUTION_ENV),
+        help=f"screen resolution as WIDTHxHEIGHT; defaults to the native display (or set {RESOLUTION_ENV})"
+    )
+    parser.add_argument(
+        "--video-driver", default=os.environ.get(DRIVER_ENV, "dummy"), choices=["dummy", "offscreen"],
+        help=f"SDL video driver used when headless (or set {DRIVER_ENV})"
+    )
+
+
+def get_backend(args):
+    """ Create the display backend selected by parsed arguments. """
+
+    if args.headless:
+        return HeadlessBackend(args.resolution, args.video_driver)
+
+    return DisplayBackend(args.resolution)
@@ -0,0 +1,260 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+import tempfile
+
+import pygame as pg
+
+CACHE_VERSION = 2
+MAGIC = b"GPFC"
+HEADER = struct.Struct("<4sIQI") # magic, version, index offset, index length
+DATA_START = 32
+BAKE_CHUNK = 15 # Angles rotated per worker task
+
+# Source images decoded in each worker process, keyed by cache label
+_WORKER_IMAGES = {}
+
+# Source image hashes, keyed by path, modification time and size
+_DIGESTS = {}
+
+
+def file_digest(path):
+    """ Hash the contents of a source image, reading it again only once it has changed. """
+
+    stat = os.stat(path)
+    signature = (str(path), stat.st_mtime_ns, stat.st_size)
+    if signature in _DIGESTS:
+        return _DIGESTS[signature]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as in_file:
+        for chunk in iter(lambda: in_file.read(1 << 16), b""):
+            digest.update(chunk)
+
+    _DIGESTS[signature] = digest.hexdigest()
+    return _DIGESTS[signature]
+
+
+def native_format(surface):
+    """ Determine the buffer format matching the surface's pixel layout. """
+
+    # BGRA buffers are only understood by newer versions of pygame
+    if pg.version.vernum >= (2, 1, 3):
+        if surface.get_masks() == (0xff0000, 0xff00, 0xff, 0xff000000):
+            return "BGRA"
+
+    return "RGBA"
+
+
+def _init_worker(sources):
+    """ Wrap raw source buffers sent to a worker process in surfaces. """
+
+    for label, (raw, size, fmt) in sources.items():
+        _WORKER_IMAGES[label] = pg.image.frombuffer(raw, size, fmt)
+
+
+def _rotate_chunk(label, angles, fmt):
+    """ Rotate a source image to each angle, returning raw buffers. Runs in worker processes. """
+
+    image = _WORKER_IMAGES[label]
+    frames = []
+    for angle in angles:
+        frame = pg.transform.rotozoom(image, angle, 1)
+        frames.append((frame.get_size(), pg.image.tostring(frame, fmt)))
+
+    return frames
+
+
+class CachedFrames:
+    """
+        Read-only view of a cache entry. Surfaces are wrapped around the mapped
+        pixel data on request, so frames that are not in use cost no memory
+        beyond what the OS keeps paged in.
+    """
+
+    def __init__(self, mapped, index):
+        self.mapped = mapped
+        self.view = memoryview(mapped)
+        self.format = index["format"]
+        self.entries = index["frames"]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, angle):
+        w, h, offset = self.entries[angle]
+        start = DATA_START + offset
+        return pg.image.frombuffer(self.view[start:start + (w * h * 4)], (w, h), self.format)
+
+    def size(self, angle):
+        w, h, _ = self.entries[angle]
+        return w, h
+
+
+class FrameCache:
+    """
+        On-disk store of pre-rotated cargo frames. Entries are keyed by the
+        source image hash and target dimensions, which are all the frames
+        depend on, and are read back without copying through a memory-mapped
+        file.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self._entries = {}
+
+    def key(self, image_path, x_dim, y_dim):
+        """ Build cache key for a given cargo image and size. """
+
+        # The screen modifier is already reflected in the size; keying on it as well
+        # would give the same label different keys at different resolutions
+        parts = [CACHE_VERSION, file_digest(image_path), round(x_dim), round(y_dim)]
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()[:16]
+
+    def path(self, label, key):
+        return self.cache_dir / f"{label}_{key}.frames"
+
+    def load(self, label, key):
+        """ Map a cache entry. Returns None if no valid entry exists. """
+
+        # Reuse entries already mapped by an earlier game this session
+        if (label, key) in self._entries:
+            return self._entries[(label, key)]
+
+        path = self.path(label, key)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, "rb") as in_file:
+                mapped = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        # A truncated or corrupt entry is treated as missing so it gets baked again
+        try:
+            magic, version, index_offset, index_len = HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or version != CACHE_VERSION or index_offset + index_len > len(mapped):
+                raise ValueError("stale or truncated cache entry")
+
+            index = json.loads(mapped[index_offset:index_offset + index_len].decode())
+            frames = index["frames"]
+            if len(frames) != 360 or any(DATA_START + offset + w * h * 4 > index_offset for w, h, offset in frames):
+                raise ValueError("cache entry frames do not fit its pixel data")
+        except (struct.error, ValueError, KeyError, TypeError):
+            mapped.close()
+            return None
+
+        entry = CachedFrames(mapped, index)
+
+        self._entries = {k: v for k, v in self._entries.items() if k[0] != label}
+        self._entries[(label, key)] = entry
+
+        return entry
+
+    def close(self):
+        """ Unmap every entry. Frames read from them must no longer be in use. """
+
+        for entry in self._entries.values():
+            entry.view.release()
+            entry.mapped.close()
+        self._entries = {}
+
+    def bake(self, jobs, workers=None):
+        """
+            Render and store all 360 rotations for each (label, key, image) job.
+            Rotation is split across worker processes when more than one worker
+            is available (None for one per core). Raises OSError before any
+            rotation is done if the cache directory cannot be written.
+        """
+
+        self.check_writable()
+        workers = (os.cpu_count() or 1) if workers is None else workers
+
+        if workers > 1:
+            try:
+                self._bake_parallel(jobs, workers)
+                return
+            except BrokenProcessPool:
+                pass # Workers could not be started; fall back to rotating in this process
+
+        for label, key, image in jobs:
+            self.store(label, key, (pg.transform.rotozoom(image, angle, 1) for angle in range(0, 360)))
+
+    def _bake_parallel(self, jobs, workers):
+        sources = {}
+        for label, _, image in jobs:
+            fmt = native_format(image)
+            sources[label] = (pg.image.tostring(image, fmt), image.get_size(), fmt)
+
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(sources,)) as executor:
+            # Queue every chunk up front so all cores stay busy across cargo types
+            futures = {}
+            for label, _, _ in jobs:
+                fmt = sources[label][2]
+                futures[label] = [
+                    executor.submit(_rotate_chunk, label, range(start, min(start + BAKE_CHUNK, 360)), fmt)
+                    for start in range(0, 360, BAKE_CHUNK)
+                ]
+
+            # Reassemble surfaces in angle order as each cargo type completes
+            for label, key, _ in jobs:
+                fmt = sources[label][2]
+                frames = (
+                    pg.image.frombuffer(data, size, fmt)
+                    for future in futures[label]
+                    for size, data in future.result()
+                )
+                self.store(label, key, frames)
+
+    def check_writable(self):
+        """ Raise OSError if entries cannot be written to the cache directory. """
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryFile(dir=self.cache_dir):
+            pass
+
+    def store(self, label, key, frames):
+        """
+            Stream frames (an iterable of surfaces in angle order) to disk and
+            replace any stale entries for the label.
+        """
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        fmt = None
+        entries = []
+        offset = 0
+
+        # Write to temporary file first so an interrupted bake never leaves a partial entry
+        path = self.path(label, key)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as out_file:
+            out_file.write(b"\0" * DATA_START)
+
+            for frame in frames:
+                fmt = fmt or native_format(frame)
+                w, h = frame.get_size()
+                entries.append([w, h, offset])
+                out_file.write(pg.image.tostring(frame, fmt))
+                offset += w * h * 4
+
+            # Index follows the pixel data; header is filled in last
+            index_bytes = json.dumps({"format": fmt, "frames": entries}).encode()
+            out_file.write(index_bytes)
+            out_file.seek(0)
+            out_file.write(HEADER.pack(MAGIC, CACHE_VERSION, DATA_START + offset, len(index_bytes)))
+        os.replace(tmp_path, path)
+
+        # Invalidate stale entries
+        for stale in self.cache_dir.glob(f"{label}_*.frames"):
+            if stale != path:
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass # Still mapped by a running game on some platforms
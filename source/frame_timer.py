@@ -0,0 +1,215 @@
+from array import array
+import csv
+import time
+
+import pygame as pg
+
+# Phases of a gameplay frame, in the order they are shown
+PHASES = ["events", "clear", "particles", "cargo", "aps", "phagophore", "hud", "overlay", "flip", "wait"]
+IDLE_PHASES = ["wait"] # Time spent waiting for the next tick rather than working
+
+GRAPH_OK = (40, 160, 60)
+GRAPH_SLOW = (220, 40, 40)
+OVERLAY_BACKGROUND = (255, 255, 255, 190)
+
+
+def percentile(values, q):
+    """ Nearest-rank percentile of a sequence of numbers. """
+
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class NullTimer:
+    """ Stands in for a FrameTimer when frames are not being timed. """
+
+    def begin(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end(self):
+        pass
+
+
+class FrameTimer:
+    """
+        Lap timer for the phases of each frame. mark(phase) charges the time
+        since the previous mark to that phase, so a phase can be charged from
+        several places in a frame. Finished frames are kept in a fixed-size
+        ring buffer holding the most recent capacity frames.
+    """
+
+    def __init__(self, phases=PHASES, capacity=600):
+        self.phases = list(phases)
+        self.index = {phase: i for i, phase in enumerate(self.phases)}
+        self.idle = [self.index[phase] for phase in IDLE_PHASES if phase in self.index]
+        self.capacity = capacity
+
+        self.samples = [array("d", bytes(8 * capacity)) for _ in self.phases]
+        self.busy = array("d", bytes(8 * capacity)) # Frame time spent working, in seconds
+        self.frames = 0
+
+        self.current = [0.0] * len(self.phases)
+        self.last = None
+
+    def __len__(self):
+        return min(self.frames, self.capacity)
+
+    def begin(self):
+        self.current = [0.0] * len(self.phases)
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.current[self.index[phase]] += now - self.last
+        self.last = now
+
+    def end(self):
+        slot = self.frames % self.capacity
+        for samples, value in zip(self.samples, self.current):
+            samples[slot] = value
+        self.busy[slot] = sum(self.current) - sum(self.current[i] for i in self.idle)
+        self.frames += 1
+
+    @property
+    def latest(self):
+        """ Busy time of the most recently finished frame, in seconds. """
+
+        return self.busy[(self.frames - 1) % self.capacity] if self.frames else 0.0
+
+    def _ordered(self, samples):
+        """ Samples of the recorded frames, oldest first. """
+
+        if self.frames <= self.capacity:
+            return samples[:self.frames]
+
+        slot = self.frames % self.capacity
+        return samples[slot:] + samples[:slot]
+
+    def history(self, phase=None):
+        """ Recorded times for a phase, or busy frame times when phase is None. """
+
+        return self._ordered(self.busy if phase is None else self.samples[self.index[phase]])
+
+    def summary(self):
+        """ p50 and p99 in milliseconds for each phase and for the busy frame time. """
+
+        stats = {}
+        for phase in self.phases + [None]:
+            values = self.history(phase)
+            stats[phase or "frame"] = (percentile(values, 50) * 1000, percentile(values, 99) * 1000)
+
+        return stats
+
+    def report(self):
+        """ Frame rate and percentiles of busy frame time in milliseconds over the recorded frames. """
+
+        busy = self.history()
+        totals = [sum(frame) for frame in zip(*(self.history(phase) for phase in self.phases))]
+        elapsed = sum(totals)
+
+        return {
+            "frames": len(self),
+            "fps": len(totals) / elapsed if elapsed > 0 else 0.0,
+            "p50": percentile(busy, 50) * 1000,
+            "p95": percentile(busy, 95) * 1000,
+            "p99": percentile(busy, 99) * 1000,
+            "max": max(busy, default=0.0) * 1000,
+        }
+
+    def export_csv(self, path):
+        """ Write recorded frames to a CSV file, in milliseconds, oldest first. """
+
+        columns = [self.history(phase) for phase in self.phases] + [self.history()]
+        first = self.frames - len(self)
+
+        with open(path, "w", newline="") as out_file:
+            writer = csv.writer(out_file)
+            writer.writerow(["frame"] + self.phases + ["busy"])
+            for i, row in enumerate(zip(*columns)):
+                writer.writerow([first + i] + [f"{value * 1000:.4f}" for value in row])
+
+
+class PerfOverlay:
+    """
+        On-screen p50/p99 table for each frame phase above a graph of recent
+        frame times against the frame budget, with the current quality level
+        when a governor is given. counters, if set, returns further name to
+        value pairs to list, such as live sprite counts. The overlay is
+        re-rendered only every refresh frames and blitted as one surface in
+        between.
+    """
+
+    def __init__(self, timer, font, budget, graph_size, refresh=30, governor=None):
+        self.timer = timer
+        self.governor = governor
+        self.counters = None
+        self.font = font
+        self.budget = budget # Seconds available per frame
+        self.graph_size = graph_size
+        self.refresh = refresh
+        self.visible = False
+        self.surface = None
+        self.rendered_at = None
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.surface = None
+
+    def _render(self):
+        line_height = self.font.get_linesize()
+        graph_width, graph_height = self.graph_size
+        stats = self.timer.summary()
+
+        # Phase, p50 and p99 columns
+        cells = [("phase", "p50 ms", "p99 ms")] + [
+            (phase, f"{p50:.2f}", f"{p99:.2f}") for phase, (p50, p99) in stats.items()
+        ]
+        if self.governor is not None:
+            cells.append(("quality", str(self.governor.level), f"of {len(self.governor.levels) - 1}"))
+        if self.counters is not None:
+            cells.extend((name, str(value), "") for name, value in self.counters().items())
+        rows = [[self.font.render(text, True, (0, 0, 0)) for text in row] for row in cells]
+        widths = [max(row[i].get_width() for row in rows) for i in range(3)]
+        pad = line_height // 2
+
+        width = max(sum(widths) + 4 * pad, graph_width + 2 * pad)
+        height = len(rows) * line_height + graph_height + 3 * pad
+        surface = pg.Surface((width, height), pg.SRCALPHA)
+        surface.fill(OVERLAY_BACKGROUND)
+
+        for i, row in enumerate(rows):
+            x = pad
+            for text, column_width in zip(row, widths):
+                # Left align names, right align numbers
+                offset = 0 if x == pad else column_width - text.get_width()
+                surface.blit(text, (x + offset, pad + i * line_height))
+                x += column_width + pad
+
+        # One bar per frame, scaled so the budget sits at half height
+        top = len(rows) * line_height + 2 * pad
+        scale = graph_height / (2 * self.budget)
+        for x, busy in enumerate(self.timer.history()[-graph_width:]):
+            bar = min(graph_height, round(busy * scale))
+            color = GRAPH_OK if busy <= self.budget else GRAPH_SLOW
+            pg.draw.line(surface, color, (pad + x, top + graph_height), (pad + x, top + graph_height - bar))
+        budget_y = top + graph_height - round(self.budget * scale)
+        pg.draw.line(surface, (0, 0, 0), (pad, budget_y), (pad + graph_width, budget_y))
+
+        return surface
+
+    def draw(self, screen, pos):
+        if not self.visible:
+            return None
+
+        if self.surface is None or self.timer.frames - self.rendered_at >= self.refresh:
+            self.surface = self._render()
+            self.rendered_at = self.timer.frames
+
+        return screen.blit(self.surface, pos)
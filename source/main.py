@@ -1,18 +1,29 @@
-import ctypes
+import argparse
+import atexit
 import datetime
-import json
-import math
+from functools import partial
+import gc
+import importlib.util
+import multiprocessing
 from pathlib import Path
-import random
 import sys
+import time
 
 import pygame as pg
 from pygame.locals import *
-from pygame import gfxdraw
 
 # Import personal files
+import backend
 import misc_functions
-from misc_functions import get_distance, in_bounds, mod
+from frame_timer import FrameTimer, PerfOverlay
+from misc_functions import mod
+from quality import QualityGovernor
+from recording import FrameInput, InputRecorder, InputRecording
+from renderer import DirtyRenderer
+from score_store import ScoreStore
+from score_table import ScoreTable
+from text_cache import DIGITS, TextCache
+from trail import TrailLayer
 
 # Define working directory
 DIR_PATH = Path.cwd().parent
@@ -21,17 +32,57 @@ if DIR_PATH.name == "dist":
     DIR_PATH = Path.cwd().parent.parent
 
 # Initialize variables for screen resolution
-WIDTH = ctypes.windll.user32.GetSystemMetrics(0)
-HEIGHT = ctypes.windll.user32.GetSystemMetrics(1)
+if __name__ == "__main__":
+    # Frozen builds re-launch this script for worker processes; hand those to multiprocessing
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Gameophagy")
+    backend.add_arguments(parser)
+    parser.add_argument("--difficulty", choices=["Easy", "Medium", "Hard"], help="skip the intro screen and play at this difficulty (Medium when headless)")
+    parser.add_argument("--frames", type=int, help="end each game after this many frames")
+    parser.add_argument("--seed", type=int, help="seed for the game's random events, to reproduce a round")
+    parser.add_argument("--perf-csv", type=Path, help="write per-phase timings of the most recent frames to this CSV file on exit")
+    parser.add_argument("--record", type=Path, help="record the input of each game to this file (numbered from the second game on)")
+    parser.add_argument("--replay", type=Path, help="play back a recorded game as fast as possible, then exit")
+    parser.add_argument("--stress", type=float, nargs="?", const=10, help="multiply starting cargo counts by this factor (10 if omitted), run uncapped and report frame times")
+    parser.add_argument("--fission-chance", type=int, help="percent chance each second that a mitochondrion splits (default 15)")
+    parser.add_argument("--particle-scale", type=float, help="multiply particles released by each autophagosome")
+    parser.add_argument("--fps", type=int, help="most frames drawn per second, 0 for no limit (default 60); the game itself always advances 60 steps per second")
+    parser.add_argument("--fast-forward", type=int, metavar="N", help="run N game steps per drawn frame as fast as possible, e.g. for headless throughput tests")
+    parser.add_argument("--quality", type=int, metavar="LEVEL", help="hold drawing quality at this level, 0 being the best (by default it adapts to frame time)")
+    parser.add_argument("--stress-config", type=Path, help="JSON file with any of cargo, fission, particles and frames, overridden by the flags above")
+    ARGS = parser.parse_args()
+
+    # A recording only plays back identically at the resolution it was made at
+    REPLAY = InputRecording.load(ARGS.replay) if ARGS.replay is not None else None
+    if REPLAY is not None:
+        ARGS.resolution = REPLAY.size
+        # Scalar physics would diverge from a recording made with NumPy physics
+        if REPLAY.vector_physics and importlib.util.find_spec("numpy") is None:
+            parser.error(f"{ARGS.replay} was recorded with NumPy cargo physics; install numpy to replay it")
+
+    BACKEND = backend.get_backend(ARGS)
+    WIDTH, HEIGHT = BACKEND.size
+# Imported by a worker process or tool, which never opens a window
+else:
+    ARGS = None
+    REPLAY = None
+    BACKEND = None
+    WIDTH, HEIGHT = backend.DEFAULT_RESOLUTION
 MOD = round(WIDTH / 1920, 3) # Standardize to 1920x1080 resolution 
 
 misc_functions.set_globs(w=WIDTH, h=HEIGHT,m=MOD)
 
 import assets
-from assets import Autophagosome, Button, Mitochondrion, Ribosome, RNA, Pill, Particle
+from assets import Button
 
 assets.set_globs(w=WIDTH, h=HEIGHT, m=MOD)
 
+import world
+from world import Inputs, Load, NORMAL_LOAD, World, TICKRATE
+
+world.set_globs(w=WIDTH, h=HEIGHT)
+
 # Define colors
 GRAY = (80, 80, 80)
 RED = (255, 0, 0)
@@ -41,18 +92,36 @@ BLACK = (0, 0, 0)
 PHAGO_LIGHT =  (218, 200, 101)
 PHAGO_DARK = (196, 143, 85)
 
-TICKRATE = 60
 GAMETITLE = "Gameophagy"
-HIT_CIRCLE_RADIUS = mod(100)
-MITO_NUM = 5 #default 5
-RIBO_NUM = 20 #default 20
-RNA_NUM = 10 #default 10
-TIMEOUT_THRESH = {"Easy": 240, "Medium": 60, "Hard": 20}
-TIMEOUT_PENALTY = -300
-MISS_PENALTY = 50
-MIN_AREA = mod(20000)
 DIFFICULTY = None
-FISSION_THRESH = 1
+STRESS_FRAMES = 600 # Frames played by a stress test unless a limit is given
+
+# Workload scaling for stress tests
+if ARGS is not None:
+    try:
+        LOAD, config_frames = world.read_load(ARGS.stress_config, cargo=ARGS.stress, fission=ARGS.fission_chance, particles=ARGS.particle_scale)
+    except (OSError, ValueError) as error:
+        parser.error(f"--stress-config: {error}")
+else:
+    LOAD, config_frames = NORMAL_LOAD, None
+STRESS = LOAD != NORMAL_LOAD
+
+if ARGS is not None and ARGS.frames is not None:
+    FRAME_LIMIT = ARGS.frames
+else:
+    FRAME_LIMIT = config_frames if config_frames is not None or not STRESS else STRESS_FRAMES
+SEED = ARGS.seed if ARGS is not None else None
+DIRTY_RATIO = 0.5 # Flip the whole screen once more of it than this has changed
+SCORES = None # High score store, opened by the first end screen
+PERF_KEY = K_F3 # Toggles the frame timing overlay
+GAME_KEYS = (K_q, PERF_KEY) # Keys recorded with each frame's input
+RECORDER = None # Recorder of the game in progress
+RECORD_PATH = None
+RECORD_COUNT = 0 # Games recorded so far
+SIM_STEP = 1 / TICKRATE # Seconds of game time advanced by each World.step
+MAX_CATCH_UP = 5 # Most steps run in one frame to catch up; slower machines slow the game down beyond that
+RENDER_RATE = ARGS.fps if ARGS is not None and ARGS.fps is not None else TICKRATE
+FAST_FORWARD = ARGS.fast_forward if ARGS is not None else None
 
 # Define fonts
 pg.font.init()
@@ -62,103 +131,54 @@ FONT_2 = pg.font.Font(conthrax_path, mod(80))
 FONT_3 = pg.font.Font(conthrax_path, mod(60))
 FONT_4 = pg.font.Font(conthrax_path, mod(30))
 
-# Initialize game
-pg.init()
-clock = pg.time.Clock()
-pg.display.set_caption(GAMETITLE)
-SCREEN = pg.display.set_mode((WIDTH, HEIGHT))
-try:
-    SCREEN = pg.display.set_mode((0, 0), pg.FULLSCREEN)
-except pg.error: # Error sometimes encountered with 4K displays
-    SCREEN = pg.display.set_mode((WIDTH, HEIGHT))
-
-icon = pg.image.load(str(DIR_PATH / "images" / "icon.png"))
-pg.display.set_icon(icon)
-
-
-class ParticleProfile:
-    """ Stores key information about particles to be generated. """
-
-    def __init__(self, AP):
-        # Get particle spawn location based on source autophagosome
-        center = AP.rect.center
-        radius = 0.5 * Particle().x_dim
-        self.x = center[0] - radius
-        self.y = center[1] - radius
-
-        # Cap velocity and reverse
-        speed_cap = mod(15)
-        d_mod = max([abs(AP.dx), abs(AP.dy)]) / speed_cap
-        mod_dx = -round(AP.dx / d_mod, 1)
-        mod_dy = -round(AP.dy / d_mod, 1)
+# Rendered text reused across frames, with numbers assembled from pre-rasterized digits
+HUD_TEXT = TextCache(FONT_3, BLACK, glyphs=DIGITS)
+LABEL_TEXT = TextCache(FONT_4, BLACK)
 
-        # Make non-zero
-        if mod_dx == 0:
-            mod_dx += 0.1 * (-1**random.randint(1, 2))
+# Time spent in each phase of recent gameplay frames, kept across games
+FRAME_TIMER = FrameTimer()
+# Lowers drawing quality while frames run over budget, also kept across games
+QUALITY = QualityGovernor(1 / (RENDER_RATE or TICKRATE))
+if ARGS is not None and ARGS.quality is not None:
+    QUALITY.pin(ARGS.quality)
 
-        if mod_dy == 0:
-            mod_dy += 0.1 * (-1**random.randint(1, 2))
+PERF_OVERLAY = PerfOverlay(FRAME_TIMER, FONT_4, 1 / TICKRATE, (mod(600), mod(150)), governor=QUALITY)
 
-        self.base_dx = mod_dx
-        self.base_dy = mod_dy
-
-        # Determine number of particles to spawn based on captured cargo
-        num_particles = len(AP.contents) * 6
+# Initialize game
+clock = pg.time.Clock()
+if __name__ == "__main__":
+    SCREEN = BACKEND.open(GAMETITLE)
 
-        self.queue = num_particles
+    icon = assets.IMAGES.load("icon.png", mode=None)
+    pg.display.set_icon(icon)
 
-    def spawn(self, num_particles, particle_cargo):
-        """ Generate particles based on particle profile. """
+    if ARGS.perf_csv is not None:
+        atexit.register(FRAME_TIMER.export_csv, ARGS.perf_csv)
 
-        for _ in range(min(self.queue, num_particles)):
-            # Get unique velocities from base velocity
-            dx = self.base_dx + (random.randint(mod(-300), mod(300)) / 100)
-            dy = self.base_dy + (random.randint(mod(-300), mod(300)) / 100)
 
-            # Generate particle and add to cargo group
-            _particle = Particle(x=self.x, y=self.y, dx=dx, dy=dy)
-            particle_cargo.add(_particle)
-            self.queue -= 1
-        
-        return particle_cargo
+def save_recording():
+    """ Write out the recording of the current game, if any. """
 
+    global RECORDER
 
-def check_trapped(APs, items):
-    """
-        Checks if any cargo items were inside upon AP formation then update
-        cargo and AP parameters accordingly.
-    """
+    if RECORDER is not None:
+        RECORDER.save(RECORD_PATH)
+        RECORDER = None
 
-    trapped_cargo = pg.sprite.Group()
 
-    for AP in APs:
-        for item in items:
-            max_distance = max([
-                get_distance(AP.rect.center, item.rect.topleft),
-                get_distance(AP.rect.center, item.rect.topright),
-                get_distance(AP.rect.center, item.rect.bottomleft),
-                get_distance(AP.rect.center, item.rect.bottomright),
-            ])
+# Keep the recording of a game quit part way through
+atexit.register(save_recording)
 
-            if max_distance < AP.radius:
-                item.trapped = True
-                AP.contents.append(item)
-                trapped_cargo.add(item)
 
-    return trapped_cargo
+def apply_quality(game, trail, renderer):
+    """ Bring drawing and particle settings in line with the current quality level. """
 
+    quality = QUALITY.quality
+    trail.antialias = quality.antialias
+    assets.ANGLE_STEP = quality.angle_step
+    renderer.full_ratio = quality.full_ratio
 
-def purge_cargo(all_sprites_group, buffer=0):
-    """ Kill captured sprites and update score accordingly. """
-
-    score_change = 0
-    for sprite in all_sprites_group:
-        if not in_bounds(WIDTH, HEIGHT, sprite, buffer):
-            score_change += sprite.score_val
-            sprite.kill()
-
-
-    return score_change
+    game.particle_quality = quality.particles
 
 
 def inactivate_buttons(buttons):
@@ -169,7 +189,28 @@ def inactivate_buttons(buttons):
             button.active = False
 
 
+def run_scenes(scene):
+    """
+        Run screens one after another from a single loop. Each scene is called
+        with no arguments and returns the next scene, or None to quit, so a
+        finished screen and everything it loaded is released before the next
+        one starts.
+    """
+
+    while scene is not None:
+        scene = scene()
+
+        # Sprites and their groups refer to each other, so collect them between scenes
+        gc.collect()
+
+
 def display_page(pages):
+    """ Show pages of information with buttons to flip through them. """
+
+    def switch(scene):
+        nonlocal next_scene
+        next_scene = scene
+
     def incriment_page(val):
         nonlocal cur_page
         cur_page += val
@@ -183,7 +224,7 @@ def display_page(pages):
     images = []
     for page in pages:
         # Create main image object
-        image = pg.image.load(str(DIR_PATH / "images" / page)).convert()
+        image = assets.IMAGES.load(page, mode="convert")
         image_aspect = round(image.get_width() / image.get_height(), 3)
         screen_aspect = round(WIDTH / HEIGHT, 3)
 
@@ -194,16 +235,17 @@ def display_page(pages):
             new_height = HEIGHT
             new_width = HEIGHT * image_aspect
 
-        image = pg.transform.scale(image, (int(new_width), int(new_height)))
+        image = assets.IMAGES.load(page, (int(new_width), int(new_height)), "convert")
         images.append(image)
 
-    home_button = Button(mod(1580), mod(30), mod(250), mod(105), FONT_3, "Home", callback_=intro_screen)
+    home_button = Button(mod(1580), mod(30), mod(250), mod(105), FONT_3, "Home", callback_=switch, scene=intro_screen)
     back_button = Button(mod(1500), images[0].get_height()-mod(100), mod(180), mod(60), FONT_4, "Back", callback_=incriment_page, val=-1)
     next_button = Button(mod(1700), images[0].get_height()-mod(100), mod(180), mod(60), FONT_4, "Next", callback_=incriment_page, val=1)
 
     cur_page = 0
+    next_scene = None
 
-    while True:
+    while next_scene is None:
         SCREEN.blit(images[cur_page], (0, 0))
 
     
@@ -223,13 +265,18 @@ def display_page(pages):
 
         pg.display.flip()
 
+    return next_scene
+
 
 def intro_screen():
     """ Show introduciton screen and acquire difficulty setting. """
 
+    def switch(scene):
+        nonlocal next_scene
+        next_scene = scene
+
     # Set up intro screen background
-    into_bg = pg.image.load(str(DIR_PATH / "images" / "start_screen_basic.png")).convert()
-    into_bg = pg.transform.scale(into_bg, (WIDTH, HEIGHT))
+    into_bg = assets.IMAGES.load("start_screen_basic.png", (WIDTH, HEIGHT), "convert")
     
     # Set up title
     title = FONT_1.render(GAMETITLE, True, BLACK)
@@ -237,12 +284,12 @@ def intro_screen():
     pg.display.update()
 
     # Initalize buttons
-    instruct_button = Button(mod(1250), mod(70), mod(280), mod(60), FONT_4, "Instructions", callback_=display_page, pages=["instructions.png"])
-    sci_button = Button(mod(1550), mod(70), mod(280), mod(60), FONT_4, "Science", callback_=display_page, pages=["science_1.png", "science_2.png", "science_3.png"])
+    instruct_button = Button(mod(1250), mod(70), mod(280), mod(60), FONT_4, "Instructions", callback_=switch, scene=partial(display_page, ["instructions.png"]))
+    sci_button = Button(mod(1550), mod(70), mod(280), mod(60), FONT_4, "Science", callback_=switch, scene=partial(display_page, ["science_1.png", "science_2.png", "science_3.png"]))
     easy_button = Button(mod(1250), mod(150), mod(180), mod(60), FONT_4, "Easy", toggle_=True)
     med_button = Button(mod(1450), mod(150), mod(180), mod(60), FONT_4, "Medium", toggle_=True)
     hard_button = Button(mod(1650), mod(150), mod(180), mod(60), FONT_4, "Hard", toggle_=True)
-    play_button = Button(mod(1580), mod(230), mod(250), mod(105), FONT_3, "Play", callback_=game_loop)
+    play_button = Button(mod(1580), mod(230), mod(250), mod(105), FONT_3, "Play", callback_=switch, scene=game_loop)
     buttons = [instruct_button, sci_button, easy_button, med_button, hard_button, play_button]
 
     # Initalize difficulty
@@ -251,8 +298,8 @@ def intro_screen():
     med_button.active = True
 
     # Intro page loop
-    intro = True
-    while intro:
+    next_scene = None
+    while next_scene is None:
         SCREEN.blit(into_bg, (0, 0))
         SCREEN.blit(title, mod(40, 21))
 
@@ -262,7 +309,7 @@ def intro_screen():
             # Allow quick play with return key
             if event.type == KEYDOWN:
                 if event.key == K_RETURN:
-                    game_loop()
+                    next_scene = game_loop
 
             # Check for difficulty change
             for button in buttons:
@@ -276,64 +323,85 @@ def intro_screen():
 
         pg.display.flip()
 
+    return next_scene
+
+
+def end_screen(score, finished=True):
+    """ Display end screen including final score and high scores. Only finished games are recorded. """
+
+    def switch(scene):
+        nonlocal next_scene
+        next_scene = scene
+
+    global SCORES
+
+    # Nobody can press a button when headless, and benchmark runs are not real games
+    if BACKEND.headless:
+        return None
 
-def end_screen(score):
-    """ Display end screen including final score and high scores. """
-    
     score = int(score)
 
-    # Read in high scores from JSON
-    try:
-        with open((DIR_PATH / "scores" / "high_scores.json"), "r") as in_file:
-            score_list = json.loads(in_file.read())
-    
-        # Add line for current game
+    # Scores from the old JSON list are imported the first time the database is created
+    if SCORES is None:
+        SCORES = ScoreStore(DIR_PATH / "scores" / "high_scores.db", legacy_json=DIR_PATH / "scores" / "high_scores.json")
+
+    # Record the current game
+    if finished:
         cur_date = datetime.date.today()
         cur_date_fmt = f"{cur_date.month}/{cur_date.day}/{cur_date.year}"
-        score_list.append({"score": int(score), "difficulty": DIFFICULTY, "date": cur_date_fmt})    
-
-        # Update high scores JSON
-        with open((DIR_PATH / "scores" / "high_scores.json"), "w") as out_file:
-            json.dump(score_list, out_file, indent=4)
-    
-    # If error encountered, reset high scores file and try again
-    except json.decoder.JSONDecodeError:
-        with open((DIR_PATH / "scores" / "high_scores.json"), "w") as out_file:
-            out_file.write("[]")
-        end_screen(score)
+        SCORES.add(score, DIFFICULTY, cur_date_fmt)
 
-    play_button = Button(mod(1300), mod(20), mod(425), mod(120), FONT_3, "Play again", callback_=intro_screen)
+    play_button = Button(mod(1300), mod(20), mod(425), mod(120), FONT_3, "Play again", callback_=switch, scene=intro_screen)
 
     # Show final score
-    bg = pg.image.load(str(DIR_PATH / "images" / "full_background.png")).convert()
-    bg = pg.transform.scale(bg, (WIDTH, HEIGHT))
+    bg = assets.IMAGES.load("full_background.png", (WIDTH, HEIGHT), "convert")
 
     final_score_text = FONT_2.render(("Final Score: " + str(score)), True, (0, 0, 0))
 
-    # Sort high scores
-    score_list = sorted(score_list, key=lambda x: int(round(float(x["score"]))), reverse=True)
+    # Only the rows in view are fetched and rendered; the rest are reached by scrolling
+    score_table = ScoreTable(FONT_3, mod(0, 600, 1200), mod(80))
+    score_table.set_rows(SCORES.ranked())
 
     # End page loop
-    while True:
-        SCREEN.blit(bg, (0, 0))
-        SCREEN.blit(final_score_text, mod(100, 20))
-        
-        # Show high scores
-        for i, line in enumerate(score_list[:10]):
-            core_text = FONT_3.render(str(line["score"]), True, (0, 0, 0))
-            diff_text = FONT_3.render(line["difficulty"], True, (0, 0, 0))
-            date_text = FONT_3.render(line["date"], True, (0, 0, 0))
-            SCREEN.blit(core_text, mod(100, 150 + (i * 80)))
-            SCREEN.blit(diff_text, mod(700, 150 + (i * 80)))
-            SCREEN.blit(date_text, mod(1300, 150 + (i * 80)))
-
+    backdrop = None
+    redraw = True
+    next_scene = None
+    while next_scene is None:
         for event in pg.event.get():
             exit_check(event)
 
             play_button.handle_event(event, DIFFICULTY)
+            redraw = True
+
+            # Scroll through older scores
+            scrolled = False
+            if event.type == MOUSEBUTTONDOWN and event.button in (4, 5):
+                scrolled = score_table.scroll(-1 if event.button == 4 else 1)
+            elif event.type == KEYDOWN:
+                if event.key in (K_UP, K_DOWN):
+                    scrolled = score_table.scroll(-1 if event.key == K_UP else 1)
+                elif event.key in (K_PAGEUP, K_PAGEDOWN):
+                    scrolled = score_table.page(-1 if event.key == K_PAGEUP else 1)
+            if scrolled:
+                backdrop = None
+
+        # Compose static parts of the page once per scroll position
+        if backdrop is None:
+            backdrop = bg.copy()
+            backdrop.blit(final_score_text, mod(100, 20))
+            score_table.draw(backdrop, mod(100, 150))
+            redraw = True
+
+        # Only redraw once something has happened
+        if redraw:
+            SCREEN.blit(backdrop, (0, 0))
+            play_button.draw(SCREEN)
+            pg.display.flip()
+            redraw = False
 
-        play_button.draw(SCREEN)
-        pg.display.flip()
+        clock.tick(TICKRATE)
+
+    return next_scene
 
 
 def exit_check(event):
@@ -350,316 +418,240 @@ def exit_check(event):
         pg.quit()
         sys.exit()
 
-def spawn_cargo():
-    """ Add cargo to game. """
-    
-    # Initalize sprite groups
-    all_cargo = pg.sprite.Group()
-    good_cargo = pg.sprite.Group()
-    particle_cargo = pg.sprite.Group()
-
-    # Generate mitochondria
-    for _ in range(MITO_NUM):
-        _mito = Mitochondrion()
-        all_cargo.add(_mito)
-        good_cargo.add(_mito)
-
-    # # Generate ribosomes
-    for _ in range(RIBO_NUM):
-        _ribo = Ribosome()
-        all_cargo.add(_ribo)
-        good_cargo.add(_ribo)
-
-    # # Generate RNAs
-    for _ in range(RNA_NUM):
-        _rna = RNA()
-        all_cargo.add(_rna)
-        good_cargo.add(_rna)
-
-    return all_cargo, good_cargo, particle_cargo
-
-
-def fission_mito(all_cargo, good_cargo):
-    """ Split mitochondrion into two smaller mitochondria. """
-
-    rand = random.randint(1, 100)
-    if rand >= 15: #15% chance of fission
-        return all_cargo, good_cargo
-
-    # Extract largest mitochondrion
-    main_mito = None
-    for cargo in all_cargo:
-        if isinstance(cargo, assets.Mitochondrion):
-            if not cargo.trapped:
-                if main_mito is None:
-                    main_mito = cargo
-                if cargo.image_static.get_width() > main_mito.image_static.get_width():
-                    main_mito = cargo
-    
-    # Skip if none left
-    if main_mito is None:
-        return all_cargo, good_cargo
-
-    # Skip if all mitos have gone through two fissions
-    if round(main_mito.image_static.get_width()) == round((Mitochondrion().image_static.get_width()/4)):
-        return all_cargo, good_cargo
-
-    # Create mini-mitos
-    for _ in range(2):
-        if round(main_mito.image_static.get_width()) == (Mitochondrion().image_static.get_width()):
-            image_dict = assets.MITO_MED_IMAGES
-        else:
-            image_dict = assets.MITO_SMALL_IMAGES
-       
-        _mito = Mitochondrion(
-                image_dict = image_dict,
-                x_dim=main_mito.image_static.get_width()/2, 
-                y_dim=main_mito.image_static.get_height()/2,
-                score_val=main_mito.score_val/2,
-                x=main_mito.rect.center[0]-(main_mito.image_static.get_width()/4),
-                y=main_mito.rect.center[1]-(main_mito.image_static.get_height()/4),
-                scale_score=False
-                )
-
-        all_cargo.add(_mito)
-        good_cargo.add(_mito)
-    
-    # Destory original mito
-    main_mito.kill()
-
-    return all_cargo, good_cargo
-
-
-def aaline(surface, color, start_pos, end_pos, width=1):
-    """ Draws wide anti-aliased lines. """
-    # ref https://stackoverflow.com/a/30599392/355230
+def game_loop():
+    """ Initialize and run game loop, returning the end screen. """
 
-    x0, y0 = start_pos
-    x1, y1 = end_pos
-    midpnt_x, midpnt_y = (x0+x1)/2, (y0+y1)/2  # Center of line segment.
-    length = math.hypot(x1-x0, y1-y0)
-    angle = math.atan2(y0-y1, x0-x1)  # Slope of line.
-    width2, length2 = width/2, length/2
-    sin_ang, cos_ang = math.sin(angle), math.cos(angle)
+    global RECORDER
+    global RECORD_PATH
+    global RECORD_COUNT
 
-    width2_sin_ang  = width2*sin_ang
-    width2_cos_ang  = width2*cos_ang
-    length2_sin_ang = length2*sin_ang
-    length2_cos_ang = length2*cos_ang
+    if REPLAY is not None:
+        load = Load(*REPLAY.meta["load"]) if REPLAY.meta.get("load") else NORMAL_LOAD
+        game = World(REPLAY.difficulty, REPLAY.seed, REPLAY.vector_physics, frame_timer=FRAME_TIMER, load=load)
+    else:
+        game = World(DIFFICULTY, SEED, frame_timer=FRAME_TIMER, load=LOAD)
+    running = True
 
-    # Calculate box ends.
-    ul = (midpnt_x + length2_cos_ang - width2_sin_ang,
-          midpnt_y + width2_cos_ang  + length2_sin_ang)
-    ur = (midpnt_x - length2_cos_ang - width2_sin_ang,
-          midpnt_y + width2_cos_ang  - length2_sin_ang)
-    bl = (midpnt_x + length2_cos_ang + width2_sin_ang,
-          midpnt_y - width2_cos_ang  + length2_sin_ang)
-    br = (midpnt_x - length2_cos_ang + width2_sin_ang,
-          midpnt_y - width2_cos_ang  - length2_sin_ang)
+    # Log every frame's input so the game can be played back exactly
+    if ARGS is not None and ARGS.record is not None and REPLAY is None:
+        RECORD_COUNT += 1
+        RECORD_PATH = ARGS.record
+        if RECORD_COUNT > 1:
+            RECORD_PATH = ARGS.record.with_name(f"{ARGS.record.stem}-{RECORD_COUNT}{ARGS.record.suffix}")
+        RECORDER = InputRecorder(game.difficulty, game.seed, (WIDTH, HEIGHT), game.vector_physics, game.load)
 
-    pg.gfxdraw.aapolygon(surface, (ul, ur, br, bl), color)
-    pg.gfxdraw.filled_polygon(surface, (ul, ur, br, bl), color)
+    # Replays, stress tests and fast-forward run a fixed number of steps per frame instead of keeping to the clock
+    steps_per_frame = (FAST_FORWARD or 1) if REPLAY is not None or STRESS or FAST_FORWARD else None
 
+    # Set caption
+    pg.display.set_caption(GAMETITLE)
 
-def game_loop():
-    """ Initialize and run game loop. """
+    # Add background
+    game_bg = assets.IMAGES.load("full_background.png", (WIDTH, HEIGHT), "convert")
+    PAS_image = assets.IMAGES.load("PAS.png", (mod(210), mod(210)), "convert", BLACK)
 
-    assets.set_globs(d=DIFFICULTY)
-    assets.set_image_dicts()
+    # Only redraw and update the parts of the screen that change
+    renderer = DirtyRenderer(SCREEN, game_bg, DIRTY_RATIO)
 
-    # Initialize internal variables
-    score_text = FONT_3.render("0", True, (0, 0, 0))
-    score = 0
-    phago_count = 0
-    running = True
-    mouse_pressed = False
-    timed_out = False
-    phago_locs = None
-    start_loc = None
-    prev_loc = None
-    particle_profile = None
+    # Outer and inner lines of the phagophore: color, joint radius, line width
+    trail = TrailLayer(SCREEN.get_size(), [(PHAGO_LIGHT, mod(31), mod(60)), (PHAGO_DARK, mod(11), mod(23))])
 
-    timer = 1
-    tick_count = 0
+    # List what is on screen in the timing overlay
+    PERF_OVERLAY.counters = lambda: {"cargo": len(game.all_cargo), "particles": len(game.particles)}
 
-    # Set caption
-    pg.display.set_caption(GAMETITLE)
+    # Start at the quality the last game settled on
+    QUALITY.restart()
+    apply_quality(game, trail, renderer)
 
-    # Initialize sprite groups
-    APs = pg.sprite.Group()
-    trapped_cargo = pg.sprite.Group()
-    all_cargo, good_cargo, particle_cargo = spawn_cargo()
+    # Game time not yet simulated, keys not yet handed to a step and the cursor position of the last step
+    accumulator = 0.0
+    keys = []
+    last_pos = None
 
-    # Add background
-    game_bg = pg.image.load(str(DIR_PATH / "images" / "full_background.png")).convert()
-    game_bg = pg.transform.scale(game_bg, (WIDTH, HEIGHT))
-    PAS_image = pg.image.load(str(DIR_PATH / "images" / "PAS.png")).convert()
-    PAS_image = pg.transform.scale(PAS_image, (mod(210), mod(210)))
-    PAS_image.set_colorkey(BLACK)
+    # Images are all loaded by now; anything decoded from here on is disk I/O during play
+    images_at_start = assets.IMAGES.stats()
 
     # Main game loop
+    start_time = last_time = time.perf_counter()
     while running:      
-
-        SCREEN.blit(game_bg, (0, 0))
-        # SCREEN.fill(BACKGROUND_BLUE)
+        FRAME_TIMER.begin()
 
         # Allow for closing
         for event in pg.event.get():
             exit_check(event)
             
-            # Add quit option
-            if event.type == KEYDOWN:
-                if event.key == K_q:
-                    for sprite in all_cargo:
-                        sprite.kill()
-                        score = 0
-
-        #Handle timing
-        tick_count += 1
-        if tick_count >= TICKRATE:
-            # Chance of fission every second
-            all_cargo, good_cargo = fission_mito(all_cargo, good_cargo)
-            
-            tick_count = 0
-            timer += 1
-
-        # Update cargo and particles on screen
-        particle_cargo.update()
-        particle_cargo.draw(SCREEN)
-        all_cargo.update()
-        all_cargo.draw(SCREEN)
-
-        # Store mouse position for current frame
-        cur_loc = pg.mouse.get_pos()
-
-        # Handle AP acceleration due to mouse dragging
-        for AP in APs:
-            dead_AP = AP
-            AP.handle_event(event, prev_loc, cur_loc)
-            AP.update(SCREEN)
-            AP.draw(SCREEN)
-
-            # Purge cargo sprites and generate particle profile if AP has left screen
-            if len(APs) == 0:
-                score += purge_cargo(all_cargo)
-                particle_profile = ParticleProfile(dead_AP)
-
-        # Spawn particles if necessary
-        if particle_profile is not None and particle_profile.queue > 0:
-            particle_cargo = particle_profile.spawn(2, particle_cargo)
+            # Quit option and overlay toggle
+            if event.type == KEYDOWN and event.key in GAME_KEYS:
+                keys.append(event.key)
+
+            # Window contents were lost
+            if event.type == VIDEOEXPOSE:
+                renderer.invalidate()
+
+        # Run as many fixed steps as the time since the last frame covers
+        now = time.perf_counter()
+        if steps_per_frame is not None:
+            steps = steps_per_frame
+        else:
+            accumulator = min(accumulator + now - last_time, MAX_CATCH_UP * SIM_STEP)
+            steps = int(accumulator / SIM_STEP)
+            accumulator -= steps * SIM_STEP
+        last_time = now
+
+        # Sample mouse once per frame and spread its movement over the frame's steps
+        mouse_pos, mouse_down = pg.mouse.get_pos(), pg.mouse.get_pressed()[0]
+        start_pos = last_pos if last_pos is not None else mouse_pos
+        FRAME_TIMER.mark("events")
+
+        flash = False
+        for step in range(steps):
+            # Take the recorded input when replaying
+            if REPLAY is not None:
+                if REPLAY.finished:
+                    break
+                frame_input = REPLAY.next_input()
+            else:
+                share = (step + 1) / steps
+                pos = (round(start_pos[0] + (mouse_pos[0] - start_pos[0]) * share), round(start_pos[1] + (mouse_pos[1] - start_pos[1]) * share))
+                frame_input = FrameInput(pos, mouse_down, tuple(keys))
+            keys = []
+
+            if RECORDER is not None:
+                RECORDER.record(*frame_input)
+
+            if PERF_KEY in frame_input.keys:
+                PERF_OVERLAY.toggle()
+
+            # Advance the simulation
+            game.step(Inputs(frame_input.mouse_pos, frame_input.mouse_down, K_q in frame_input.keys))
+            last_pos = frame_input.mouse_pos
+            flash = flash or game.flash
+
+            if game.over or (FRAME_LIMIT is not None and game.frame_count >= FRAME_LIMIT):
+                break
+
+        # Draw moving sprites this far from their previous to their current step
+        alpha = accumulator / SIM_STEP if steps_per_frame is None else 1
+
+        renderer.clear()
+        # SCREEN.fill(BACKGROUND_BLUE)
+        FRAME_TIMER.mark("clear")
+
+        # Draw cargo and particles
+        renderer.add(game.particles.draw(SCREEN, alpha))
+        FRAME_TIMER.mark("particles")
+        renderer.add(game.all_cargo.draw(SCREEN, alpha))
+        FRAME_TIMER.mark("cargo")
+
+        for AP in game.APs:
+            renderer.add(AP.draw(SCREEN, alpha))
 
         # Redraw trapped cargo to bring to front
-        trapped_cargo.draw(SCREEN)
-
-        #-----------------------------PHAGOPHORE HANDLING--------------------------
-        if len(APs) < 1:
-            # Mouse pressed
-            if pg.mouse.get_pressed()[0]:
-                if not timed_out:
-                    # Initial presss
-                    if not mouse_pressed:
-                        start_loc = cur_loc
-                        phago_locs = []
-                        mouse_pressed = True
-
-                    phago_locs.append(cur_loc)
-
-                    # Check for phagophore drawing timeout
-                    distance = get_distance(start_loc, cur_loc)
-                    if len(phago_locs) >= TIMEOUT_THRESH[DIFFICULTY]:
-                        if distance >= HIT_CIRCLE_RADIUS:
-                            _pill = Pill(score_val=TIMEOUT_PENALTY)
-                            all_cargo.add(_pill)
-                            SCREEN.fill(RED)
-                        # If the circle was completed
-                        else:
-                            AP = Autophagosome(phago_locs)
-                            if AP.area > MIN_AREA:
-                                APs.add(AP)
-                                phago_count += 1
-                                trapped_cargo = check_trapped(APs, all_cargo)
-
-                        timed_out = True
-                        start_loc, phago_locs = None, None
-
-            # Mouse released
-            elif not pg.mouse.get_pressed()[0]:
-                if timed_out:
-                    timed_out = False
-                    mouse_pressed = False
-                # Initial release
-                elif mouse_pressed and not timed_out:
-                    # If the circle was completed
-                    distance = get_distance(start_loc, cur_loc)
-                    if distance >= HIT_CIRCLE_RADIUS:
-                        score -= MISS_PENALTY
-                        phago_count += 1
-                    # If circle was not completed
-                    else:
-                        AP = Autophagosome(phago_locs)
-                        if AP.area > MIN_AREA:
-                            APs.add(AP)
-                            phago_count += 1
-                            trapped_cargo = check_trapped(APs, all_cargo)
-
-                    start_loc, phago_locs = None, None
-                    mouse_pressed = False
+        renderer.add(game.trapped_cargo.draw(SCREEN, alpha))
+        FRAME_TIMER.mark("aps")
+
+        # Flash screen when phagophore timed out
+        if flash:
+            SCREEN.fill(RED)
+            renderer.invalidate()
 
+        #-----------------------------PHAGOPHORE DRAWING--------------------------
+        if len(game.APs) < 1:
             # Draw phagophore
-            if phago_locs is not None:
-                if len(phago_locs) > 2:
-                    # Draw outer line
-                    last_loc = phago_locs[0]
-                    for loc in phago_locs[1:]:
-                        pg.draw.circle(SCREEN, PHAGO_LIGHT, (last_loc[0], last_loc[1]), mod(31))
-                        aaline(SCREEN, PHAGO_LIGHT, last_loc, loc, mod(60))                   
-                        last_loc = loc
-
-                    # Draw inner line
-                    last_loc = phago_locs[0]
-                    for loc in phago_locs[1:]:
-                        pg.draw.circle(SCREEN, PHAGO_DARK, (last_loc[0], last_loc[1]), mod(11))
-                        aaline(SCREEN, PHAGO_DARK, last_loc, loc, mod(23))                     
-                        last_loc = loc
+            phago_locs = game.phago_locs
+            if phago_locs is not None and phago_locs.samples > 2:
+                # Only rasterize newly added segments, then composite the whole stroke
+                trail.extend(phago_locs)
+                renderer.add(trail.draw(SCREEN))
+            else:
+                trail.reset()
 
             # Draw PAS
-            if start_loc is not None:
+            if game.start_loc is not None:
                 # Define function to get image print location based on click location
                 shift = lambda x, y: (x-mod(105), y-mod(105))
-                SCREEN.blit(PAS_image, shift(*start_loc))
+                renderer.add(SCREEN.blit(PAS_image, shift(*game.start_loc)))
                 # pg.draw.circle(SCREEN, PHAGO_LIGHT, start_loc, mod(100))
-                PAS_label = FONT_4.render(("PAS"), True, (0, 0, 0))
-                text_x, text_y = start_loc
-                SCREEN.blit(PAS_label, (text_x-32, text_y-25))
-
-        prev_loc = cur_loc
+                PAS_label = LABEL_TEXT.render("PAS")
+                text_x, text_y = game.start_loc
+                renderer.add(SCREEN.blit(PAS_label, (text_x-32, text_y-25)))
+        FRAME_TIMER.mark("phagophore")
 
         # Display score
-        score = int(score)
-        score_text = FONT_3.render(str(score), True, (0, 0, 0))
-        SCREEN.blit(score_text, mod(15, 0))
+        score_text = HUD_TEXT.render(game.score)
+        renderer.add(SCREEN.blit(score_text, mod(15, 0)))
         
-        # FPS counter
-        # fps = str(int(clock.get_fps()))
-        # fps_text = FONT_3.render(fps, True, (0, 0, 0))
-        # SCREEN.blit(fps_text, (500, 10))
-
         # Display phagophore count
-        phago_count_text = FONT_3.render(str(phago_count), True, (0, 0, 0))
+        phago_count_text = HUD_TEXT.render(game.phago_count)
         x_pos = (WIDTH - phago_count_text.get_size()[0]) - mod(40)
-        SCREEN.blit(phago_count_text, (x_pos, 0))
+        renderer.add(SCREEN.blit(phago_count_text, (x_pos, 0)))
+        FRAME_TIMER.mark("hud")
 
-        # Check for end of game
-        if len(good_cargo) < 1:
-            running = False
-            end_screen(str(score))
+        # Per-phase frame timings
+        renderer.add(PERF_OVERLAY.draw(SCREEN, mod(15, 100)))
+        FRAME_TIMER.mark("overlay")
 
         # Refresh Screen
-        pg.display.flip()
+        renderer.present()
+        FRAME_TIMER.mark("flip")
 
-        # Set number of frames per second
-        clock.tick(TICKRATE)
+        # Limit frames per second, running replays, stress tests and fast-forward flat out
+        clock.tick(RENDER_RATE if steps_per_frame is None else 0)
+        FRAME_TIMER.mark("wait")
+        FRAME_TIMER.end()
+
+        # Trade quality for frame time while playing in real time
+        if steps_per_frame is None and QUALITY.update(FRAME_TIMER.latest):
+            apply_quality(game, trail, renderer)
 
-intro_screen()
-pg.quit()
-sys.exit()
\ No newline at end of file
+        # Check for end of game
+        if game.over or (FRAME_LIMIT is not None and game.frame_count >= FRAME_LIMIT) or (REPLAY is not None and REPLAY.finished):
+            running = False
+            save_recording()
+
+            # Replays and stress tests report their speed rather than adding to the high scores
+            if REPLAY is not None or STRESS:
+                elapsed = time.perf_counter() - start_time
+                report = FRAME_TIMER.report()
+                particles = game.particles.stats()
+                print(f"{'Replayed' if REPLAY is not None else 'Played'} {game.frame_count} steps in {elapsed:.2f} s ({game.frame_count / elapsed:.1f} steps per second), score {game.score}")
+                print(
+                    f"Last {report['frames']} frames: {report['fps']:.1f} FPS sustained, busy frame time "
+                    f"p50 {report['p50']:.2f} ms, p95 {report['p95']:.2f} ms, p99 {report['p99']:.2f} ms, max {report['max']:.2f} ms; "
+                    f"{len(game.all_cargo)} cargo and {particles['live']} particles on screen"
+                )
+                images = assets.IMAGES.stats()
+                print(
+                    f"Images: {images['decodes'] - images_at_start['decodes']} decoded during the game "
+                    f"({images['decode_time'] - images_at_start['decode_time']:.3f} s), {images['decodes']} decoded in total "
+                    f"in {images['decode_time']:.3f} s, {images['hits']} cache hits, {images['cached_surfaces']} scaled surfaces kept"
+                )
+                for name, frames in assets.frame_stats().items():
+                    print(
+                        f"Rotated frames ({name}): {frames['hits'] + frames['misses']} lookups, {frames['hit_rate']:.1%} hits, "
+                        f"{frames['resident_frames']} frames in {frames['resident_bytes'] / 2 ** 20:.1f} MiB"
+                    )
+                print(
+                    f"Particles: {particles['emitted']} emitted, {particles['expired']} expired, {particles['culled']} left the screen, "
+                    f"{particles['recycled']} replaced early; at most {particles['peak']} of {particles['capacity']} live at once"
+                )
+                PERF_OVERLAY.counters = None
+                return None
+
+    # The counters refer to this game, which must not be kept alive by the overlay
+    PERF_OVERLAY.counters = None
+    # Games cut short by --frames are shown but not recorded
+    return partial(end_screen, str(game.score), finished=game.over)
+
+if __name__ == "__main__":
+    # Play straight away when replaying, stress testing, a difficulty is given or nobody is watching
+    if REPLAY is not None:
+        DIFFICULTY = REPLAY.difficulty
+        run_scenes(game_loop)
+    elif ARGS.difficulty is not None or BACKEND.headless or STRESS:
+        DIFFICULTY = ARGS.difficulty or "Medium"
+        run_scenes(game_loop)
+    else:
+        run_scenes(intro_screen)
+    pg.quit()
+    sys.exit()
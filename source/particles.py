@@ -0,0 +1,197 @@
+from array import array
+import random
+
+try:
+    import numpy as np
+except ImportError: # Optional; particles are then moved one at a time
+    np = None
+
+import assets
+from misc_functions import mod
+
+PARTICLE_SIZE = mod(30)
+PARTICLE_CAPACITY = 4096 # Slots in the pool; once all are taken new particles replace the oldest
+PARTICLE_TTL = 90 # Steps a particle lives on average (1.5 s at 60 steps per second)
+TTL_JITTER = 0.25 # Lifetimes vary this far either side of PARTICLE_TTL so a burst thins out gradually
+FADE_STEPS = 30 # Steps over which a particle fades out before it expires
+FADE_LEVELS = 8 # Distinct opacities drawn while fading
+CULL_MARGIN = mod(100) # Distance past the screen edge beyond which particles heading away are dropped
+
+
+class ParticleSystem:
+    """
+        Fixed pool of particles kept in preallocated arrays of position,
+        velocity and age. Slots are handed out in a ring, so a burst writes
+        into existing slots instead of creating objects, and once the pool is
+        full new particles replace the oldest ones. Particles fade out towards
+        the end of their lifetime and are dropped once they expire or are off
+        screen and heading away from it; bursts start off screen, where the
+        autophagosome left, and fly back in. They share one surface per
+        opacity and the whole system is drawn with a single Surface.blits call.
+    """
+
+    def __init__(self, capacity=PARTICLE_CAPACITY, seed=None, vectorized=None):
+        self.capacity = capacity
+        self.vectorized = (np is not None) if vectorized is None else (vectorized and np is not None)
+        self.head = 0 # Next slot to hand out
+        self.used = 0 # Slots handed out at least once, all that scalar loops need to visit
+
+        # Shared image at each opacity, the last fully opaque
+        image = assets.IMAGES.load("particle.png", (PARTICLE_SIZE, PARTICLE_SIZE), colorkey=assets.WHITE)
+        self.images = []
+        for level in range(1, FADE_LEVELS):
+            faded = image.copy()
+            faded.set_alpha(round(255 * level / FADE_LEVELS))
+            self.images.append(faded)
+        self.images.append(image)
+
+        if self.vectorized:
+            self.rng = np.random.default_rng(seed)
+            self.x, self.y, self.dx, self.dy = (np.zeros(capacity) for _ in range(4))
+            self.age, self.ttl = (np.zeros(capacity, dtype=np.int64) for _ in range(2))
+            self.alive = np.zeros(capacity, dtype=bool)
+        else:
+            self.rng = random.Random(seed)
+            self.x, self.y, self.dx, self.dy = (array("d", bytes(8 * capacity)) for _ in range(4))
+            self.age, self.ttl = (array("q", bytes(8 * capacity)) for _ in range(2))
+            self.alive = bytearray(capacity)
+
+        # Lifecycle counts
+        self.live = 0
+        self.peak = 0
+        self.emitted = 0
+        self.expired = 0 # Reached the end of their lifetime
+        self.culled = 0 # Left the screen
+        self.recycled = 0 # Replaced while still live because the pool was full
+
+    def __len__(self):
+        return self.live
+
+    def _slices(self, count):
+        """ Slices of the ring covering the next count slots, which wrap around at most once. """
+
+        count = min(count, self.capacity)
+        start, stop = self.head, self.head + count
+        self.head = stop % self.capacity
+        self.used = max(self.used, min(stop, self.capacity))
+
+        if stop <= self.capacity:
+            return [slice(start, stop)]
+        return [slice(start, self.capacity), slice(0, stop - self.capacity)]
+
+    def emit(self, x, y, dx, dy, spread, count):
+        """ Release count particles at top left corner (x, y) with velocities within spread of (dx, dy). """
+
+        shortest, longest = round(PARTICLE_TTL * (1 - TTL_JITTER)), round(PARTICLE_TTL * (1 + TTL_JITTER))
+
+        for part in self._slices(count):
+            if self.vectorized:
+                recycled = int(np.count_nonzero(self.alive[part]))
+                self.x[part] = x
+                self.y[part] = y
+                self.age[part] = 0
+                self.ttl[part] = self.rng.integers(shortest, longest + 1, part.stop - part.start)
+                self.alive[part] = True
+
+                # Velocities are drawn straight into the pool
+                for velocity, base in ((self.dx, dx), (self.dy, dy)):
+                    view = velocity[part]
+                    self.rng.random(out=view)
+                    view *= 2 * spread
+                    view += base - spread
+            else:
+                recycled = self.alive.count(1, part.start, part.stop)
+                for i in range(part.start, part.stop):
+                    self.x[i], self.y[i] = x, y
+                    self.dx[i] = dx + self.rng.uniform(-spread, spread)
+                    self.dy[i] = dy + self.rng.uniform(-spread, spread)
+                    self.age[i] = 0
+                    self.ttl[i] = self.rng.randint(shortest, longest)
+                    self.alive[i] = 1
+
+            self.recycled += recycled
+            self.emitted += part.stop - part.start
+            self.live += part.stop - part.start - recycled
+
+        self.peak = max(self.peak, self.live)
+
+    def step(self):
+        """ Move and age every live particle, dropping those that expired or left the screen for good. """
+
+        if not self.live:
+            return
+
+        left = top = -CULL_MARGIN - PARTICLE_SIZE
+        right, bottom = assets.WIDTH + CULL_MARGIN, assets.HEIGHT + CULL_MARGIN
+
+        if self.vectorized:
+            self.x += self.dx
+            self.y += self.dy
+            self.age += 1
+
+            expired = self.alive & (self.age >= self.ttl)
+            leaving = (
+                ((self.x < left) & (self.dx <= 0)) | ((self.x > right) & (self.dx >= 0))
+                | ((self.y < top) & (self.dy <= 0)) | ((self.y > bottom) & (self.dy >= 0))
+            )
+            outside = self.alive & ~expired & leaving
+            self.alive &= ~(expired | outside)
+
+            self.expired += int(np.count_nonzero(expired))
+            self.culled += int(np.count_nonzero(outside))
+            self.live = int(np.count_nonzero(self.alive))
+            return
+
+        x, y, dx, dy, age, ttl, alive = self.x, self.y, self.dx, self.dy, self.age, self.ttl, self.alive
+        for i in range(self.used):
+            if alive[i]:
+                x[i] += dx[i]
+                y[i] += dy[i]
+                age[i] += 1
+
+                if age[i] >= ttl[i]:
+                    alive[i] = 0
+                    self.expired += 1
+                    self.live -= 1
+                elif (
+                    (x[i] < left and dx[i] <= 0) or (x[i] > right and dx[i] >= 0)
+                    or (y[i] < top and dy[i] <= 0) or (y[i] > bottom and dy[i] >= 0)
+                ):
+                    alive[i] = 0
+                    self.culled += 1
+                    self.live -= 1
+
+    def draw(self, surface, alpha=1):
+        """ Draw live particles alpha of the way through their last step. Returns the areas drawn. """
+
+        back = 1 - alpha
+        images = self.images
+
+        if self.vectorized:
+            live = np.flatnonzero(self.alive)
+            xs = np.rint(self.x[live] - self.dx[live] * back).astype(int).tolist()
+            ys = np.rint(self.y[live] - self.dy[live] * back).astype(int).tolist()
+            levels = np.minimum((self.ttl[live] - self.age[live]) * FADE_LEVELS // FADE_STEPS, FADE_LEVELS - 1).tolist()
+            return surface.blits([(images[level], pos) for level, pos in zip(levels, zip(xs, ys))])
+
+        x, y, dx, dy, age, ttl = self.x, self.y, self.dx, self.dy, self.age, self.ttl
+        return surface.blits([
+            (
+                images[min((ttl[i] - age[i]) * FADE_LEVELS // FADE_STEPS, FADE_LEVELS - 1)],
+                (round(x[i] - dx[i] * back), round(y[i] - dy[i] * back)),
+            )
+            for i in range(self.used) if self.alive[i]
+        ])
+
+    def stats(self):
+        """ Live particle count and how many were emitted and dropped, for telemetry. """
+
+        return {
+            "live": self.live,
+            "peak": self.peak,
+            "capacity": self.capacity,
+            "emitted": self.emitted,
+            "expired": self.expired,
+            "culled": self.culled,
+            "recycled": self.recycled,
+        }
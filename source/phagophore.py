@@ -0,0 +1,83 @@
+from array import array
+
+MAX_RUN = 32 # Most consecutive points merged into one segment
+
+
+def segment_distance_sq(point, start, end):
+    """ Squared distance from a point to the line segment between start and end. """
+
+    px, py = point
+    x0, y0 = start
+    x1, y1 = end
+    dx, dy = x1 - x0, y1 - y0
+
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return (px - x0) ** 2 + (py - y0) ** 2
+
+    t = max(0, min(1, ((px - x0) * dx + (py - y0) * dy) / length_sq))
+    return (px - x0 - t * dx) ** 2 + (py - y0 - t * dy) ** 2
+
+
+class PhagophorePath:
+    """
+        Points of a phagophore stroke packed into an int array and simplified
+        as they arrive. The last point is tentative: it is dropped in favour of
+        the next one while every point merged since the previous kept point
+        stays within tolerance of the new segment. The bounds and number of
+        points sampled over the full stroke are tracked separately.
+    """
+
+    def __init__(self, tolerance):
+        self.coords = array("i")
+        self.tolerance_sq = tolerance ** 2
+        self.merged = []
+        self.samples = 0
+        self.bounds = None # left, top, right, bottom
+
+    def __len__(self):
+        return len(self.coords) // 2
+
+    def __getitem__(self, i):
+        i = i if i >= 0 else len(self) + i
+        return self.coords[2 * i], self.coords[2 * i + 1]
+
+    @property
+    def committed(self):
+        """ Number of leading points that will no longer change. """
+        return len(self) - 1 if len(self) > 1 else len(self)
+
+    def points(self, start=0, stop=None):
+        stop = len(self) if stop is None else stop
+        for i in range(start, stop):
+            yield self.coords[2 * i], self.coords[2 * i + 1]
+
+    def append(self, loc):
+        x, y = loc
+        self.samples += 1
+
+        if self.bounds is None:
+            self.bounds = (x, y, x, y)
+            self.coords.extend((x, y))
+            return
+
+        left, top, right, bottom = self.bounds
+        self.bounds = (min(left, x), min(top, y), max(right, x), max(bottom, y))
+
+        # Points that have not moved from the first one add nothing
+        if len(self) == 1:
+            if (x - self.coords[0]) ** 2 + (y - self.coords[1]) ** 2 > self.tolerance_sq:
+                self.coords.extend((x, y))
+            return
+
+        # Merge the tentative point into a longer segment if the stroke stays close to it
+        anchor, tail = self[-2], self[-1]
+        candidates = self.merged + [tail]
+        if len(candidates) < MAX_RUN and all(
+            segment_distance_sq(point, anchor, loc) <= self.tolerance_sq for point in candidates
+        ):
+            self.merged = candidates
+            self.coords[-2:] = array("i", (x, y))
+        else:
+            self.merged = []
+            self.coords.extend((x, y))
@@ -0,0 +1,231 @@
+try:
+    import numpy as np
+except ImportError: # Optional; cargo groups fall back to Cargo.update without it
+    np = None
+
+from pygame import Rect
+
+import assets
+
+AVAILABLE = np is not None
+
+ARRAYS = [
+    "x", "y", "w", "h", "dx", "dy", "angle", "angle_rate", "provider", "bound", "adjust", "active", "cell",
+    "prev_cx", "prev_cy",
+]
+
+
+def round_half_away(values):
+    """ Round like pygame's Rect attribute setters. """
+    return np.copysign(np.floor(np.abs(values) + 0.5), values)
+
+
+class CargoPhysics:
+    """
+        Motion of a cargo group kept in contiguous NumPy arrays. Every sprite is
+        advanced and bounced off the screen edges in a single vectorized step,
+        reproducing Cargo.update, and rects, angles and frames are only written
+        back to the sprites when the group is synced for drawing. Sprites that
+        cross into new cells are refiled in the group's spatial hash, if any.
+    """
+
+    def __init__(self, seed=None, capacity=64):
+        self.rng = np.random.default_rng(seed)
+        self.angle_choices = np.array(assets.ANGLE_LIST)
+        self.grid = None
+
+        self.sprites = []
+        self.slots = {}
+        self.free = []
+
+        # Untrimmed frame sizes per provider and angle; row 0 is unused by unbound sprites
+        self.providers = []
+        self.size_table = np.zeros((1, 360, 2))
+
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.w = np.zeros(0)
+        self.h = np.zeros(0)
+        self.dx = np.zeros(0)
+        self.dy = np.zeros(0)
+        self.angle = np.zeros(0, dtype=np.int64)
+        self.angle_rate = np.zeros(0, dtype=np.int64)
+        self.provider = np.zeros(0, dtype=np.int64)
+        self.bound = np.zeros(0, dtype=bool)
+        self.adjust = np.zeros(0, dtype=bool)
+        self.active = np.zeros(0, dtype=bool)
+        self.cell = np.zeros((0, 2), dtype=np.int64)
+        self.prev_cx = np.zeros(0) # Centers before the last step, for drawing between steps
+        self.prev_cy = np.zeros(0)
+        self._grow(capacity)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _grow(self, capacity):
+        extra = capacity - len(self.sprites)
+        for name in ARRAYS:
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros((extra,) + array.shape[1:], dtype=array.dtype)]))
+
+        self.free.extend(range(capacity - 1, len(self.sprites) - 1, -1))
+        self.sprites.extend([None] * extra)
+
+    def _provider_id(self, image_dict):
+        for i, provider in enumerate(self.providers):
+            if provider is image_dict:
+                return i + 1
+
+        self.providers.append(image_dict)
+        self.size_table = np.concatenate([self.size_table, np.array(image_dict.sizes, dtype=float)[None]])
+        return len(self.providers)
+
+    def add(self, sprite):
+        """ Take over motion of a sprite from its current state. """
+
+        if sprite in self.slots:
+            return
+        if not self.free:
+            self._grow(len(self.sprites) * 2)
+
+        i = self.free.pop()
+        self.sprites[i] = sprite
+        self.slots[sprite] = i
+
+        self.x[i], self.y[i] = sprite.rect.topleft
+        self.w[i], self.h[i] = sprite.rect.size
+        self.prev_cx[i], self.prev_cy[i] = sprite.rect.center
+        self.dx[i], self.dy[i] = sprite.dx, sprite.dy
+        self.angle[i] = sprite.angle
+        self.angle_rate[i] = sprite.angle_rate
+        self.provider[i] = self._provider_id(sprite.image_dict) if sprite.bound else 0
+        self.bound[i] = sprite.bound
+        self.adjust[i] = sprite.adjust_box
+        self.active[i] = not sprite.trapped
+        if self.grid is not None:
+            self.cell[i] = self.grid.cell(sprite.rect)
+
+    def remove(self, sprite):
+        i = self.slots.pop(sprite, None)
+        if i is None:
+            return
+
+        # Hand motion state back to the sprite
+        sprite.dx, sprite.dy = self.dx[i].item(), self.dy[i].item()
+        sprite.angle, sprite.angle_rate = self.angle[i].item(), self.angle_rate[i].item()
+
+        self.sprites[i] = None
+        self.active[i] = False
+        self.free.append(i)
+
+    def step(self):
+        """ Update positions, velocities and angles of all untrapped sprites. """
+
+        idx = np.flatnonzero(self.active)
+        if not idx.size:
+            return
+
+        x, y, w, h = self.x[idx], self.y[idx], self.w[idx], self.h[idx]
+        dx, dy = self.dx[idx], self.dy[idx]
+        angle, angle_rate = self.angle[idx], self.angle_rate[idx]
+        bound, adjust = self.bound[idx], self.adjust[idx]
+        self.prev_cx[idx], self.prev_cy[idx] = x + w // 2, y + h // 2
+
+        # Rect.move_ip truncates fractional velocities
+        x = x + np.trunc(dx)
+        y = y + np.trunc(dy)
+
+        delta = np.where(adjust, np.abs(np.sin(np.radians((angle % 90) * 2))) * (w * 0.24) / 2, 0)
+
+        # Constrain to screen and flip velocities
+        hit_left = bound & (x + delta < 0)
+        hit_right = bound & (x + w - delta > assets.WIDTH)
+        hit_top = bound & (y + delta < 0)
+        hit_bottom = bound & (y + h - delta > assets.HEIGHT)
+
+        x = np.where(hit_left, round_half_away(0 - delta), x)
+        x = np.where(hit_right, round_half_away(assets.WIDTH + delta) - w, x)
+        y = np.where(hit_top, round_half_away(0 - delta), y)
+        y = np.where(hit_bottom, round_half_away(assets.HEIGHT + delta) - h, y)
+        dx = np.where(hit_left ^ hit_right, -dx, dx)
+        dy = np.where(hit_top ^ hit_bottom, -dy, dy)
+
+        # Only sprites that bounced draw a new spin
+        bounced = hit_left | hit_right | hit_top | hit_bottom
+        if bounced.any():
+            angle_rate = angle_rate.copy()
+            angle_rate[bounced] = self.rng.choice(self.angle_choices, int(bounced.sum()))
+
+        # Update angle and recenter on the rotated frame
+        angle = np.where(bound, (angle + angle_rate) % 360, angle)
+        sizes = self.size_table[self.provider[idx], angle]
+        new_w = np.where(bound, sizes[:, 0], w)
+        new_h = np.where(bound, sizes[:, 1], h)
+
+        self.x[idx] = np.trunc(x + (w - new_w) / 2 + dx)
+        self.y[idx] = np.trunc(y + (h - new_h) / 2 + dy)
+        self.w[idx], self.h[idx] = new_w, new_h
+        self.dx[idx], self.dy[idx] = dx, dy
+        self.angle[idx], self.angle_rate[idx] = angle, angle_rate
+
+        if self.grid is not None:
+            self._refile(idx)
+
+    def _refile(self, idx):
+        """ Move sprites whose centers crossed into another cell of the grid. """
+
+        w, h = self.w[idx], self.h[idx]
+        cell = np.stack([
+            (self.x[idx] + w // 2) // self.grid.cell_size,
+            (self.y[idx] + h // 2) // self.grid.cell_size,
+        ], axis=1).astype(np.int64)
+        self.grid.margin = max(self.grid.margin, w.max() / 2, h.max() / 2)
+
+        moved = (cell != self.cell[idx]).any(axis=1)
+        for i, new_cell in zip(idx[moved].tolist(), cell[moved].tolist()):
+            self.grid.place(self.sprites[i], tuple(new_cell))
+        self.cell[idx] = cell
+
+    def sync(self, blits=None, alpha=1):
+        """
+            Write rects and frames back to the sprites; velocities and angles
+            stay in the arrays until a sprite is removed. Blit arguments for
+            every sprite, placed alpha of the way through its last step, are
+            appended to blits if given.
+        """
+
+        # Offsets from the current positions back to where the sprites are drawn
+        if blits is not None and alpha < 1:
+            back = 1 - alpha
+            shift_x = np.rint((self.prev_cx - (self.x + self.w // 2)) * back).astype(int).tolist()
+            shift_y = np.rint((self.prev_cy - (self.y + self.h // 2)) * back).astype(int).tolist()
+        else:
+            shift_x = shift_y = [0] * len(self.sprites)
+
+        state = zip(self.sprites, self.active.tolist(), self.x.astype(int).tolist(), self.y.astype(int).tolist(),
+                    self.w.astype(int).tolist(), self.h.astype(int).tolist(), self.angle.tolist(), shift_x, shift_y)
+
+        for i, (sprite, active, x, y, w, h, angle, sx, sy) in enumerate(state):
+            if sprite is None:
+                continue
+
+            # Trapped sprites are carried by their AP, which owns their rect from now on
+            if sprite.trapped:
+                if active and self.grid is not None:
+                    self.grid.remove(sprite)
+                self.active[i] = False
+            elif active:
+                sprite.rect = Rect(x, y, w, h)
+
+                if sprite.bound:
+                    frame = sprite.frame = sprite.image_dict.frame(assets.draw_angle(angle))
+                    sprite.image = frame.image
+
+                    if blits is not None:
+                        x += frame.offset[0] + (w - frame.size[0]) // 2 + sx
+                        y += frame.offset[1] + (h - frame.size[1]) // 2 + sy
+                        blits.append((frame.source, (x, y), frame.area))
+                    continue
+
+            if blits is not None:
+                blits.append(sprite.blit_args((sx, sy) if active else sprite.draw_offset(alpha)))
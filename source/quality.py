@@ -0,0 +1,106 @@
+from collections import deque, namedtuple
+
+from frame_timer import percentile
+
+# Settings for one quality level
+# antialias: smooth phagophore edges, angle_step: degrees between the rotations cargo is drawn at,
+# particles: share of particles released, full_ratio: DirtyRenderer full_ratio (0 always redraws in full)
+Quality = namedtuple("Quality", ["antialias", "angle_step", "particles", "full_ratio"])
+
+# Best first, each level giving up a little more than the one before
+LEVELS = [
+    Quality(antialias=True, angle_step=1, particles=1, full_ratio=0.5),
+    Quality(antialias=False, angle_step=1, particles=1, full_ratio=0.5),
+    Quality(antialias=False, angle_step=1, particles=0.5, full_ratio=0.5),
+    Quality(antialias=False, angle_step=4, particles=0.5, full_ratio=0.25),
+    Quality(antialias=False, angle_step=8, particles=0.25, full_ratio=0),
+]
+
+
+class QualityGovernor:
+    """
+        Steps quality down when recent frames run over budget and back up when
+        they leave plenty of room. Decisions are made on a high percentile of a
+        full window of frames, the thresholds for dropping and raising quality
+        are far apart and a level that was raised and then had to be dropped
+        again waits twice as long before being tried again, so the level
+        settles instead of oscillating.
+    """
+
+    def __init__(self, budget, levels=LEVELS, window=30, high=0.9, low=0.6, up_delay=180, max_up_delay=3600):
+        self.budget = budget # Seconds of busy time available per frame
+        self.levels = levels
+        self.window = deque(maxlen=window)
+        self.high = high # Share of the budget above which quality drops
+        self.low = low # Share of the budget below which quality rises
+        self.base_up_delay = up_delay # Frames at a level before quality may rise
+        self.max_up_delay = max_up_delay
+
+        self.level = 0
+        self.pinned = False
+        self.up_delay = up_delay
+        self.frames_at_level = 0
+        self.raised = False # Current level was reached by raising quality
+        self.changes = 0
+
+    @property
+    def quality(self):
+        return self.levels[self.level]
+
+    def pin(self, level):
+        """ Hold quality at a level, clamped to the available ones, from now on. """
+
+        self.level = max(0, min(level, len(self.levels) - 1))
+        self.pinned = True
+
+    def restart(self):
+        """ Forget recent frames, e.g. once loading a new game has skewed them. """
+
+        self.window.clear()
+        self.frames_at_level = 0
+
+    def _set_level(self, level):
+        self.level = level
+        self.window.clear()
+        self.frames_at_level = 0
+        self.changes += 1
+
+    def update(self, busy):
+        """ Account for a frame that kept the machine busy this many seconds. Returns whether the level changed. """
+
+        if self.pinned:
+            return False
+
+        self.window.append(busy)
+        self.frames_at_level += 1
+        if len(self.window) < self.window.maxlen:
+            return False
+
+        load = percentile(self.window, 90) / self.budget
+
+        if load > self.high and self.level < len(self.levels) - 1:
+            # A level that failed soon after being raised to is given longer before the next try
+            if self.raised and self.frames_at_level < self.up_delay:
+                self.up_delay = min(2 * self.up_delay, self.max_up_delay)
+            else:
+                self.up_delay = self.base_up_delay
+            self.raised = False
+            self._set_level(self.level + 1)
+            return True
+
+        if load < self.low and self.level > 0 and self.frames_at_level >= self.up_delay:
+            self.raised = True
+            self._set_level(self.level - 1)
+            return True
+
+        return False
+
+    def stats(self):
+        return {
+            "level": self.level,
+            "levels": len(self.levels),
+            "pinned": self.pinned,
+            "changes": self.changes,
+            "up_delay": self.up_delay,
+            **self.quality._asdict(),
+        }
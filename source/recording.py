@@ -0,0 +1,203 @@
+from collections import namedtuple
+import json
+import os
+from pathlib import Path
+import struct
+import zlib
+
+RECORDING_VERSION = 2
+MAGIC = b"GPIR"
+HEADER = struct.Struct("<4sII") # magic, version, metadata length
+
+# Flags starting each frame record
+DOWN = 1 # Left mouse button held
+MOVED = 2 # Cursor offset from the previous frame follows
+KEYS = 4 # Keys pressed this frame follow
+REPEAT = 8 # Count of frames identical to the previous one follows
+
+# Player input for one frame
+# mouse_pos: cursor location, mouse_down: left button held, keys: keys pressed this frame
+FrameInput = namedtuple("FrameInput", ["mouse_pos", "mouse_down", "keys"])
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def encode_frames(frames):
+    """ Delta encode frame inputs, collapsing runs of unchanged frames. """
+
+    out = bytearray()
+    prev = FrameInput((0, 0), False, ())
+    repeats = 0
+
+    for frame in frames:
+        if frame == prev and not frame.keys:
+            repeats += 1
+            continue
+
+        if repeats:
+            out.append(REPEAT)
+            _write_varint(out, repeats)
+            repeats = 0
+
+        moved = frame.mouse_pos != prev.mouse_pos
+        out.append((DOWN if frame.mouse_down else 0) | (MOVED if moved else 0) | (KEYS if frame.keys else 0))
+
+        if moved:
+            _write_varint(out, _zigzag(frame.mouse_pos[0] - prev.mouse_pos[0]))
+            _write_varint(out, _zigzag(frame.mouse_pos[1] - prev.mouse_pos[1]))
+
+        if frame.keys:
+            _write_varint(out, len(frame.keys))
+            for key in frame.keys:
+                _write_varint(out, key)
+
+        prev = frame._replace(keys=())
+
+    if repeats:
+        out.append(REPEAT)
+        _write_varint(out, repeats)
+
+    return bytes(out)
+
+
+def decode_frames(data):
+    """ Yield the frame inputs encoded by encode_frames. """
+
+    pos = 0
+    prev = FrameInput((0, 0), False, ())
+
+    while pos < len(data):
+        flags = data[pos]
+        pos += 1
+
+        if flags & REPEAT:
+            count, pos = _read_varint(data, pos)
+            for _ in range(count):
+                yield prev
+            continue
+
+        x, y = prev.mouse_pos
+        if flags & MOVED:
+            dx, pos = _read_varint(data, pos)
+            dy, pos = _read_varint(data, pos)
+            x, y = x + _unzigzag(dx), y + _unzigzag(dy)
+
+        keys = []
+        if flags & KEYS:
+            count, pos = _read_varint(data, pos)
+            for _ in range(count):
+                key, pos = _read_varint(data, pos)
+                keys.append(key)
+
+        frame = FrameInput((x, y), bool(flags & DOWN), tuple(keys))
+        yield frame
+
+        # Keys belong to a single frame, so repeats carry only the mouse state
+        prev = frame._replace(keys=())
+
+
+class InputRecorder:
+    """
+        Collects the input of every frame of one game along with everything
+        else needed to play it again: difficulty, seed, screen size, physics
+        engine and workload scaling.
+    """
+
+    def __init__(self, difficulty, seed, size, vector_physics, load=None):
+        self.meta = {
+            "difficulty": difficulty,
+            "seed": seed,
+            "size": list(size),
+            "vector_physics": vector_physics,
+            "load": list(load) if load is not None else None,
+        }
+        self.frames = []
+
+    def record(self, mouse_pos, mouse_down, keys=()):
+        self.frames.append(FrameInput(tuple(mouse_pos), bool(mouse_down), tuple(keys)))
+
+    def save(self, path):
+        """ Write the recording, replacing any existing file only once it is complete. """
+
+        meta = json.dumps({**self.meta, "frames": len(self.frames)}).encode()
+        body = zlib.compress(encode_frames(self.frames), 9)
+
+        path = Path(path)
+        temp_path = path.with_name(path.name + ".tmp")
+        with open(temp_path, "wb") as out_file:
+            out_file.write(HEADER.pack(MAGIC, RECORDING_VERSION, len(meta)))
+            out_file.write(meta)
+            out_file.write(body)
+        os.replace(temp_path, path)
+
+
+class InputRecording:
+    """ Recorded game loaded from a file, replayed one frame at a time with next_input(). """
+
+    def __init__(self, meta, frames):
+        self.meta = meta
+        self.frames = frames
+        self.position = 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as in_file:
+            data = in_file.read()
+
+        magic, version, meta_length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != RECORDING_VERSION:
+            raise ValueError(f"{path} is not a version {RECORDING_VERSION} input recording")
+
+        meta = json.loads(data[HEADER.size:HEADER.size + meta_length])
+        frames = list(decode_frames(zlib.decompress(data[HEADER.size + meta_length:])))
+        return cls(meta, frames)
+
+    @property
+    def difficulty(self):
+        return self.meta["difficulty"]
+
+    @property
+    def seed(self):
+        return self.meta["seed"]
+
+    @property
+    def size(self):
+        return tuple(self.meta["size"])
+
+    @property
+    def vector_physics(self):
+        return self.meta["vector_physics"]
+
+    @property
+    def finished(self):
+        return self.position >= len(self.frames)
+
+    def next_input(self):
+        frame = self.frames[self.position]
+        self.position += 1
+        return frame
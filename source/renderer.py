@@ -0,0 +1,118 @@
+import pygame as pg
+
+
+TILE_SIZE = 32 # Granularity of dirty area estimates
+
+
+def touched_tiles(rects, tile_size=TILE_SIZE):
+    """ Set of (column, row) tiles touched by rects, from which their union's area is estimated. """
+
+    tiles = set()
+    for rect in rects:
+        if rect.width <= 0 or rect.height <= 0:
+            continue
+        for x in range(rect.left // tile_size, (rect.right - 1) // tile_size + 1):
+            for y in range(rect.top // tile_size, (rect.bottom - 1) // tile_size + 1):
+                tiles.add((x, y))
+
+    return tiles
+
+
+def summed_area(rects):
+    """ Total area of rects, which their union can never exceed. """
+
+    return sum(rect.width * rect.height for rect in rects if rect.width > 0 and rect.height > 0)
+
+
+class DirtyRenderer:
+    """
+        Redraws only the parts of the screen that change. The background is
+        restored under whatever was drawn last frame and only those areas plus
+        this frame's drawing are sent to the display. Frames whose dirty area
+        covers more than full_ratio of the screen, or that were invalidated,
+        are redrawn and flipped in full instead. A full_ratio of 0 redraws
+        every frame in full without estimating dirty areas at all.
+    """
+
+    def __init__(self, screen, background, full_ratio=0.5):
+        self.screen = screen
+        self.background = background
+        self.full_ratio = full_ratio
+        self.screen_area = screen.get_width() * screen.get_height()
+
+        self.drawn = []
+        self.last_drawn = []
+        self.last_area = 0 # Summed area of last_drawn
+        self.last_tiles = set() # Tiles touched by last_drawn, None until needed
+        self.restore_all = True # Next clear() redraws the whole background
+        self.full_frame = True # Current frame is flipped in full
+
+        self.full_updates = 0
+        self.partial_updates = 0
+
+    def clear(self):
+        """ Start a frame by restoring the background under last frame's drawing. """
+
+        if self.restore_all or self.full_ratio <= 0:
+            self.screen.blit(self.background, (0, 0))
+            self.full_frame = True
+        else:
+            self.screen.blits([(self.background, rect, rect) for rect in self.last_drawn], doreturn=False)
+            self.full_frame = False
+
+        self.restore_all = False
+        self.drawn = []
+
+    def add(self, rects):
+        """ Record screen areas drawn this frame (a rect, a list of rects or None). """
+
+        if rects is None:
+            return
+        if isinstance(rects, pg.Rect):
+            self.drawn.append(rects)
+        else:
+            self.drawn.extend(rects)
+
+    def invalidate(self):
+        """ Mark the whole screen as changed, e.g. after drawing outside of tracked areas. """
+
+        self.full_frame = True
+        self.restore_all = True
+
+    def present(self):
+        """ Send this frame to the display. """
+
+        limit = self.full_ratio * self.screen_area
+        tile_area = TILE_SIZE * TILE_SIZE
+        drawn_area = summed_area(self.drawn)
+        drawn_tiles = None
+
+        # Tiles are only counted when the answer is in doubt: not for frames already
+        # flipped in full, nor for areas whose sum is within the limit
+        full = self.full_frame or self.full_ratio <= 0
+        if not full and drawn_area + self.last_area > limit:
+            drawn_tiles = touched_tiles(self.drawn)
+            if self.last_tiles is None:
+                self.last_tiles = touched_tiles(self.last_drawn)
+            full = len(drawn_tiles | self.last_tiles) * tile_area > limit
+
+        if full:
+            pg.display.flip()
+            self.full_updates += 1
+        else:
+            pg.display.update(self.last_drawn + self.drawn)
+            self.partial_updates += 1
+
+        # Patching most of the screen back is slower than one full background blit
+        if self.full_ratio > 0 and drawn_area > limit:
+            if drawn_tiles is None:
+                drawn_tiles = touched_tiles(self.drawn)
+            if len(drawn_tiles) * tile_area > limit:
+                self.restore_all = True
+
+        self.last_drawn = self.drawn
+        self.last_area = drawn_area
+        self.last_tiles = drawn_tiles
+
+    def stats(self):
+        return {"full_updates": self.full_updates, "partial_updates": self.partial_updates}
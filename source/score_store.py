@@ -0,0 +1,129 @@
+import json
+import sqlite3
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS scores (
+        id INTEGER PRIMARY KEY,
+        score INTEGER NOT NULL,
+        difficulty TEXT,
+        date TEXT
+    );
+    CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC);
+    CREATE INDEX IF NOT EXISTS scores_by_difficulty ON scores (difficulty, score DESC);
+"""
+
+
+def _row(score, difficulty, date):
+    return {"score": score, "difficulty": difficulty, "date": date}
+
+
+class RankedScores:
+    """
+        Read-only sequence of scores, best first and oldest first among ties.
+        Only the rows asked for are fetched from the database, so a slice of a
+        page costs one indexed query however many games have been recorded.
+    """
+
+    def __init__(self, store, difficulty=None):
+        self.store = store
+        self.difficulty = difficulty
+
+    def __len__(self):
+        return self.store.count(self.difficulty)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return self.store.top(stop, self.difficulty)[start:stop:step]
+            return self.store.top(max(0, stop - start), self.difficulty, offset=start)
+
+        rows = self.store.top(1, self.difficulty, offset=i if i >= 0 else len(self) + i)
+        if not rows:
+            raise IndexError("score index out of range")
+        return rows[0]
+
+
+class ScoreStore:
+    """
+        High scores kept in an indexed SQLite database. Each game is one
+        committed insert, so a crash can never leave a partly written file,
+        and ranked queries read only the rows they return. Scores from the
+        old high_scores.json are imported the first time the database is
+        created; the JSON file itself is left untouched.
+    """
+
+    def __init__(self, path, legacy_json=None):
+        self.path = path
+        self.conn = sqlite3.connect(str(path))
+
+        # Write-ahead logging keeps readers consistent and commits cheap
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate(legacy_json)
+
+    def _migrate(self, legacy_json):
+        """ Import scores from the JSON list used by earlier versions, once. """
+
+        rows = []
+        if legacy_json is not None:
+            try:
+                with open(legacy_json, "r") as in_file:
+                    rows = json.load(in_file)
+            # A missing or corrupt file has nothing worth keeping
+            except (OSError, ValueError):
+                rows = []
+
+        records = []
+        for line in rows if isinstance(rows, list) else []:
+            try:
+                records.append((int(round(float(line["score"]))), line.get("difficulty"), line.get("date")))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                continue
+
+        # Rows and the version mark land together or not at all
+        with self.conn:
+            self.conn.executemany("INSERT INTO scores (score, difficulty, date) VALUES (?, ?, ?)", records)
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def add(self, score, difficulty, date):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO scores (score, difficulty, date) VALUES (?, ?, ?)",
+                (int(score), difficulty, date),
+            )
+
+    def top(self, k, difficulty=None, offset=0):
+        """ The k best scores, optionally for one difficulty, skipping the first offset. """
+
+        if difficulty is None:
+            cursor = self.conn.execute(
+                "SELECT score, difficulty, date FROM scores ORDER BY score DESC, id LIMIT ? OFFSET ?",
+                (k, offset),
+            )
+        else:
+            cursor = self.conn.execute(
+                "SELECT score, difficulty, date FROM scores WHERE difficulty = ? "
+                "ORDER BY score DESC, id LIMIT ? OFFSET ?",
+                (difficulty, k, offset),
+            )
+
+        return [_row(*line) for line in cursor]
+
+    def count(self, difficulty=None):
+        if difficulty is None:
+            return self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM scores WHERE difficulty = ?", (difficulty,)).fetchone()[0]
+
+    def ranked(self, difficulty=None):
+        return RankedScores(self, difficulty)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,71 @@
+import pygame as pg
+
+
+class ScoreTable:
+    """
+        High score table that only rasterizes the rows in view. The visible
+        rows are composed into one surface, which is reused until the scores
+        or the scroll position change, so arbitrarily long histories can be
+        paged through.
+    """
+
+    def __init__(self, font, columns, row_height, visible_rows=10, color=(0, 0, 0)):
+        self.font = font
+        self.columns = columns # x offset of the score, difficulty and date columns
+        self.row_height = row_height
+        self.visible_rows = visible_rows
+        self.color = color
+        self.rows = []
+        self.first = 0
+        self._surface = None
+
+    @property
+    def last_first(self):
+        return max(0, len(self.rows) - self.visible_rows)
+
+    def set_rows(self, rows):
+        """ Replace table contents with a sequence of score entries, best first. """
+
+        self.rows = rows
+        self.first = min(self.first, self.last_first)
+        self._surface = None
+
+    def scroll(self, rows):
+        """ Move the view by a number of rows. Returns whether it moved. """
+
+        first = max(0, min(self.first + rows, self.last_first))
+        if first == self.first:
+            return False
+
+        self.first = first
+        self._surface = None
+        return True
+
+    def page(self, pages):
+        return self.scroll(pages * self.visible_rows)
+
+    @property
+    def surface(self):
+        if self._surface is None:
+            self._surface = self._compose()
+        return self._surface
+
+    def _compose(self):
+        cells = []
+        for i, line in enumerate(self.rows[self.first:self.first + self.visible_rows]):
+            y = i * self.row_height
+            for x, text in zip(self.columns, (str(line["score"]), line["difficulty"], line["date"])):
+                cells.append((self.font.render(text, True, self.color), (x, y)))
+
+        width = max((pos[0] + text.get_width() for text, pos in cells), default=1)
+        height = max((pos[1] + text.get_height() for text, pos in cells), default=1)
+
+        # Copy text exactly rather than alpha blending onto the empty surface
+        surface = pg.Surface((width, height), pg.SRCALPHA)
+        for text, pos in cells:
+            surface.blit(text, pos, special_flags=pg.BLEND_RGBA_MAX)
+
+        return surface
+
+    def draw(self, screen, pos):
+        return screen.blit(self.surface, pos)
@@ -0,0 +1,65 @@
+class SpatialHash:
+    """
+        Uniform grid of square cells. Each item is filed under the cell holding
+        the center of its rect, and queries widen their search area by the
+        largest half-extent seen so far, so only items in the cells around a
+        query area have to be examined.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.item_cells = {}
+        self.margin = 0
+
+    def __len__(self):
+        return len(self.item_cells)
+
+    def cell(self, rect):
+        """ Cell coordinates of a rect's center. """
+
+        x, y = rect.center
+        return x // self.cell_size, y // self.cell_size
+
+    def insert(self, item, rect):
+        """ Add an item or move it to the cell under its current rect. """
+
+        self.margin = max(self.margin, rect.width / 2, rect.height / 2)
+        self.place(item, self.cell(rect))
+
+    def place(self, item, cell):
+        old_cell = self.item_cells.get(item)
+        if old_cell == cell:
+            return
+
+        if old_cell is not None:
+            self._unfile(item, old_cell)
+
+        self.item_cells[item] = cell
+        self.cells.setdefault(cell, {})[item] = None
+
+    def remove(self, item):
+        cell = self.item_cells.pop(item, None)
+        if cell is not None:
+            self._unfile(item, cell)
+
+    def _unfile(self, item, cell):
+        items = self.cells[cell]
+        del items[item]
+        if not items:
+            del self.cells[cell]
+
+    def query_circle(self, center, radius):
+        """ Items whose rects may overlap the bounding box of a circle. """
+
+        x, y = center
+        reach = radius + self.margin
+        size = self.cell_size
+        found = []
+        for cell_x in range(int((x - reach) // size), int((x + reach) // size) + 1):
+            for cell_y in range(int((y - reach) // size), int((y + reach) // size) + 1):
+                items = self.cells.get((cell_x, cell_y))
+                if items:
+                    found.extend(items)
+
+        return found
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+
+import pygame as pg
+
+DIGITS = "-0123456789"
+
+
+class GlyphAtlas:
+    """
+        Pre-rasterized glyphs of a font packed into one surface. Strings made
+        only of atlas characters are assembled by blitting glyphs at the pen
+        positions the font itself would use, without rasterizing text.
+    """
+
+    def __init__(self, font, color, chars=DIGITS, antialias=True):
+        self.height = font.get_height()
+
+        # Pen offset within each glyph's surface, advance and right edge of the glyph
+        glyphs = [font.render(char, antialias, color) for char in chars]
+        self.metrics = {}
+        for char, (minx, maxx, _, _, advance) in zip(chars, font.metrics(chars)):
+            self.metrics[char] = (max(0, -minx), advance, maxx)
+
+        # Glyphs are copied exactly rather than alpha blended onto the empty surfaces
+        self.surface = pg.Surface((sum(glyph.get_width() for glyph in glyphs), self.height), pg.SRCALPHA)
+        self.areas = {}
+        x = 0
+        for char, glyph in zip(chars, glyphs):
+            self.areas[char] = self.surface.blit(glyph, (x, 0), special_flags=pg.BLEND_RGBA_MAX)
+            x += glyph.get_width()
+
+    def __contains__(self, text):
+        return all(char in self.areas for char in text)
+
+    def render(self, text):
+        pen = self.metrics[text[0]][0]
+        placements = []
+        width = 0
+        for char in text:
+            origin, advance, maxx = self.metrics[char]
+            placements.append(((pen - origin, 0), self.areas[char]))
+            width = max(width, pen + max(advance, maxx))
+            pen += advance
+
+        surface = pg.Surface((width, self.height), pg.SRCALPHA)
+        for dest, area in placements:
+            surface.blit(self.surface, dest, area, special_flags=pg.BLEND_RGBA_MAX)
+        return surface
+
+
+class TextCache:
+    """
+        Least recently used cache of rendered strings for one font and color.
+        Strings covered by the glyph atlas (if any) are assembled from it
+        rather than rendered by the font.
+    """
+
+    def __init__(self, font, color, capacity=64, glyphs=None, antialias=True):
+        self.font = font
+        self.color = color
+        self.capacity = capacity
+        self.antialias = antialias
+        self.atlas = GlyphAtlas(font, color, glyphs, antialias) if glyphs else None
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text):
+        text = str(text)
+
+        surface = self.surfaces.get(text)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(text)
+            return surface
+
+        self.misses += 1
+        if text and self.atlas is not None and text in self.atlas:
+            surface = self.atlas.render(text)
+        else:
+            surface = self.font.render(text, self.antialias, self.color)
+
+        self.surfaces[text] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+
+        return surface
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self.surfaces)}
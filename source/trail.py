@@ -0,0 +1,140 @@
+import math
+
+import pygame as pg
+from pygame import gfxdraw
+
+
+def aaline(surface, color, start_pos, end_pos, width=1):
+    """ Draws wide anti-aliased lines. """
+    # ref https://stackoverflow.com/a/30599392/355230
+
+    x0, y0 = start_pos
+    x1, y1 = end_pos
+    midpnt_x, midpnt_y = (x0+x1)/2, (y0+y1)/2  # Center of line segment.
+    length = math.hypot(x1-x0, y1-y0)
+    angle = math.atan2(y0-y1, x0-x1)  # Slope of line.
+    width2, length2 = width/2, length/2
+    sin_ang, cos_ang = math.sin(angle), math.cos(angle)
+
+    width2_sin_ang  = width2*sin_ang
+    width2_cos_ang  = width2*cos_ang
+    length2_sin_ang = length2*sin_ang
+    length2_cos_ang = length2*cos_ang
+
+    # Calculate box ends.
+    ul = (midpnt_x + length2_cos_ang - width2_sin_ang,
+          midpnt_y + width2_cos_ang  + length2_sin_ang)
+    ur = (midpnt_x - length2_cos_ang - width2_sin_ang,
+          midpnt_y + width2_cos_ang  - length2_sin_ang)
+    bl = (midpnt_x + length2_cos_ang + width2_sin_ang,
+          midpnt_y - width2_cos_ang  + length2_sin_ang)
+    br = (midpnt_x - length2_cos_ang + width2_sin_ang,
+          midpnt_y - width2_cos_ang  - length2_sin_ang)
+
+    gfxdraw.aapolygon(surface, (ul, ur, br, bl), color)
+    gfxdraw.filled_polygon(surface, (ul, ur, br, bl), color)
+
+    # Return bounding rect of the drawn area like pg.draw functions
+    xs = [pnt[0] for pnt in (ul, ur, br, bl)]
+    ys = [pnt[1] for pnt in (ul, ur, br, bl)]
+    left, top = math.floor(min(xs)), math.floor(min(ys))
+    return pg.Rect(left, top, math.ceil(max(xs)) - left + 1, math.ceil(max(ys)) - top + 1).clip(surface.get_rect())
+
+
+class TrailLayer:
+    """
+        Phagophore stroke rasterized incrementally. Each line of the stroke
+        (color, joint radius, width) gets a persistent layer and only newly
+        committed segments of the path are drawn onto it, so the cost per frame
+        does not grow with stroke length. The stroke is wiped from the layers
+        when it ends. Turning antialias off draws plain lines, which is
+        cheaper but leaves jagged edges.
+    """
+
+    def __init__(self, size, lines, antialias=True):
+        self.size = size
+        self.lines = lines
+        self.antialias = antialias
+        self.path = None
+        self.count = 0
+        self.rect = None
+
+        # Allocated up front and reused by every stroke
+        self.layers = []
+        for color, _, _ in lines:
+            layer = pg.Surface(size, pg.SRCALPHA)
+            layer.fill(color + (0,))
+            self.layers.append(layer)
+
+    def reset(self):
+        """ Discard the current stroke. """
+
+        if self.rect is not None:
+            for layer, (color, _, _) in zip(self.layers, self.lines):
+                layer.fill(color + (0,), self.rect)
+
+        self.path = None
+        self.count = 0
+        self.rect = None
+
+    def extend(self, path):
+        """ Rasterize segments of a PhagophorePath committed since the last call. """
+
+        # New stroke
+        if path is not self.path:
+            self.reset()
+            self.path = path
+            self.count = 1
+
+        stop = path.committed
+        rects = []
+        for layer, (color, radius, width) in zip(self.layers, self.lines):
+            last_loc = path[self.count - 1]
+            for loc in path.points(self.count, stop):
+                rects.append(pg.draw.circle(layer, color, last_loc, radius))
+                rects.append(self._segment(layer, color, last_loc, loc, width))
+                last_loc = loc
+
+        if rects:
+            self.rect = rects[0].unionall(rects) if self.rect is None else self.rect.unionall(rects)
+        self.count = max(self.count, stop)
+
+    def _segment(self, layer, color, start_pos, end_pos, width):
+        """ Draw a line onto a layer without its anti-aliased edges eating into what is already there. """
+
+        if not self.antialias:
+            return pg.draw.line(layer, color, start_pos, end_pos, width)
+
+        # Anti-aliasing overwrites the alpha of covered pixels, so draw on a scratch
+        # surface of the same color and keep the more opaque of each pixel
+        reach = math.ceil(width / 2) + 2
+        left, top = min(start_pos[0], end_pos[0]) - reach, min(start_pos[1], end_pos[1]) - reach
+        scratch = pg.Surface(
+            (abs(end_pos[0] - start_pos[0]) + 2 * reach, abs(end_pos[1] - start_pos[1]) + 2 * reach), pg.SRCALPHA
+        )
+        scratch.fill(color + (0,))
+
+        rect = aaline(scratch, color, (start_pos[0] - left, start_pos[1] - top), (end_pos[0] - left, end_pos[1] - top), width)
+        rect.move_ip(left, top)
+        layer.blit(scratch, (left, top), special_flags=pg.BLEND_RGBA_MAX)
+
+        return rect.clip(layer.get_rect())
+
+    def draw(self, surface):
+        """ Composite the stroke onto a surface. Returns the area drawn. """
+
+        rects = []
+
+        # The tentative last segment may still change, so it is drawn straight onto the surface
+        path = self.path
+        tail = path is not None and path.committed < len(path)
+
+        for layer, (color, radius, width) in zip(self.layers, self.lines):
+            if self.rect is not None:
+                rects.append(surface.blit(layer, self.rect, self.rect))
+            if tail:
+                rects.append(pg.draw.circle(surface, color, path[-2], radius))
+                line = aaline if self.antialias else pg.draw.line
+                rects.append(line(surface, color, path[-2], path[-1], width))
+
+        return rects[0].unionall(rects) if rects else None
@@ -0,0 +1,404 @@
+from collections import namedtuple
+import json
+import random
+
+import pygame as pg
+
+import assets
+import physics
+from frame_timer import NullTimer
+from particles import PARTICLE_SIZE, ParticleSystem
+from phagophore import PhagophorePath
+from spatial import SpatialHash
+from assets import Autophagosome, CargoGroup, Mitochondrion, Ribosome, RNA, Pill
+from misc_functions import get_distance, in_bounds, mod
+
+WIDTH = 0
+HEIGHT = 0
+
+TICKRATE = 60
+HIT_CIRCLE_RADIUS = mod(100)
+MITO_NUM = 5 #default 5
+RIBO_NUM = 20 #default 20
+RNA_NUM = 10 #default 10
+TIMEOUT_THRESH = {"Easy": 240, "Medium": 60, "Hard": 20}
+TIMEOUT_PENALTY = -300
+MISS_PENALTY = 50
+MIN_AREA = mod(20000)
+FISSION_THRESH = 1
+PATH_TOLERANCE = mod(2) # Phagophore points within this distance of a straight segment are merged into it
+CELL_SIZE = mod(128) # Side length of spatial hash cells used for capture tests
+VECTOR_PHYSICS = physics.AVAILABLE # Move cargo with the NumPy engine when it is installed
+PARTICLE_SPEED = 2 # Particle sprites used to move twice their velocity each frame; bursts keep that speed
+
+# Player input sampled once per frame
+# mouse_pos: cursor location, mouse_down: left button held, forfeit: quit key pressed
+Inputs = namedtuple("Inputs", ["mouse_pos", "mouse_down", "forfeit"])
+
+# Scaling of the game's workload, raised for stress tests
+# cargo: factor on starting cargo counts, fission: fission roll below which a mitochondrion splits
+# each second (1-100), particles: factor on particles released per captured cargo and per frame
+Load = namedtuple("Load", ["cargo", "fission", "particles"])
+NORMAL_LOAD = Load(cargo=1, fission=15, particles=1)
+
+
+class ParticleProfile:
+    """ Stores key information about particles to be generated. """
+
+    def __init__(self, AP, rng=random, particle_scale=1):
+        self.rng = rng
+
+        # Get particle spawn location based on source autophagosome
+        center = AP.rect.center
+        radius = 0.5 * PARTICLE_SIZE
+        self.x = center[0] - radius
+        self.y = center[1] - radius
+
+        # Cap velocity and reverse
+        speed_cap = mod(15)
+        d_mod = max([abs(AP.dx), abs(AP.dy)]) / speed_cap
+        mod_dx = -round(AP.dx / d_mod, 1)
+        mod_dy = -round(AP.dy / d_mod, 1)
+
+        # Make non-zero
+        if mod_dx == 0:
+            mod_dx += 0.1 * (-1**self.rng.randint(1, 2))
+
+        if mod_dy == 0:
+            mod_dy += 0.1 * (-1**self.rng.randint(1, 2))
+
+        self.base_dx = mod_dx
+        self.base_dy = mod_dy
+
+        # Determine number of particles to spawn based on captured cargo
+        num_particles = round(len(AP.contents) * 6 * particle_scale)
+
+        self.queue = num_particles
+
+    def spawn(self, num_particles, particles):
+        """ Release the next particles of the burst into a particle system. """
+
+        count = min(self.queue, num_particles)
+
+        # Each particle gets a unique velocity near the base velocity
+        spread = mod(300) / 100
+        particles.emit(
+            self.x, self.y,
+            PARTICLE_SPEED * self.base_dx, PARTICLE_SPEED * self.base_dy, PARTICLE_SPEED * spread,
+            count,
+        )
+        self.queue -= count
+
+        return particles
+
+
+def check_trapped(APs, items):
+    """
+        Checks if any cargo items were inside upon AP formation then update
+        cargo and AP parameters accordingly.
+    """
+
+    trapped_cargo = CargoGroup()
+
+    for AP in APs:
+        x, y = AP.rect.center
+        radius_sq = AP.radius ** 2
+
+        # Only cargo filed near the AP can be inside it
+        for item in items.near(AP.rect.center, AP.radius):
+            # Farthest corner from the AP center, compared by squared distance
+            max_distance_sq = (
+                max((item.rect.left - x) ** 2, (item.rect.right - x) ** 2)
+                + max((item.rect.top - y) ** 2, (item.rect.bottom - y) ** 2)
+            )
+
+            if max_distance_sq < radius_sq:
+                item.trapped = True
+                AP.contents.append(item)
+                trapped_cargo.add(item)
+
+    return trapped_cargo
+
+
+def purge_cargo(all_sprites_group, buffer=0):
+    """ Kill captured sprites and update score accordingly. """
+
+    score_change = 0
+    for sprite in all_sprites_group:
+        if not in_bounds(WIDTH, HEIGHT, sprite, buffer):
+            score_change += sprite.score_val
+            sprite.kill()
+
+
+    return score_change
+
+
+def spawn_cargo(rng=random, vector_physics=False, cargo_scale=1):
+    """ Add cargo to game. """
+
+    # Initalize sprite groups, handing moving cargo to the physics engine if requested
+    engine = physics.CargoPhysics(rng.randrange(2 ** 32)) if vector_physics else None
+    all_cargo = CargoGroup(physics=engine, grid=SpatialHash(CELL_SIZE))
+    good_cargo = CargoGroup()
+
+    # Generate mitochondria
+    for _ in range(round(MITO_NUM * cargo_scale)):
+        _mito = Mitochondrion(rng=rng)
+        all_cargo.add(_mito)
+        good_cargo.add(_mito)
+
+    # # Generate ribosomes
+    for _ in range(round(RIBO_NUM * cargo_scale)):
+        _ribo = Ribosome(rng=rng)
+        all_cargo.add(_ribo)
+        good_cargo.add(_ribo)
+
+    # # Generate RNAs
+    for _ in range(round(RNA_NUM * cargo_scale)):
+        _rna = RNA(rng=rng)
+        all_cargo.add(_rna)
+        good_cargo.add(_rna)
+
+    return all_cargo, good_cargo
+
+
+def fission_mito(all_cargo, good_cargo, rng=random, chance=NORMAL_LOAD.fission):
+    """ Split mitochondrion into two smaller mitochondria. """
+
+    rand = rng.randint(1, 100)
+    if rand >= chance: #15% chance of fission by default
+        return all_cargo, good_cargo
+
+    # Extract largest mitochondrion
+    main_mito = None
+    for cargo in all_cargo:
+        if isinstance(cargo, assets.Mitochondrion):
+            if not cargo.trapped:
+                if main_mito is None:
+                    main_mito = cargo
+                if cargo.image_static.get_width() > main_mito.image_static.get_width():
+                    main_mito = cargo
+
+    # Skip if none left
+    if main_mito is None:
+        return all_cargo, good_cargo
+
+    # Skip if all mitos have gone through two fissions
+    if round(main_mito.image_static.get_width()) == round((Mitochondrion().image_static.get_width()/4)):
+        return all_cargo, good_cargo
+
+    # Create mini-mitos
+    for _ in range(2):
+        if round(main_mito.image_static.get_width()) == (Mitochondrion().image_static.get_width()):
+            image_dict = assets.MITO_MED_IMAGES
+        else:
+            image_dict = assets.MITO_SMALL_IMAGES
+
+        _mito = Mitochondrion(
+                image_dict = image_dict,
+                x_dim=main_mito.image_static.get_width()/2,
+                y_dim=main_mito.image_static.get_height()/2,
+                score_val=main_mito.score_val/2,
+                x=main_mito.rect.center[0]-(main_mito.image_static.get_width()/4),
+                y=main_mito.rect.center[1]-(main_mito.image_static.get_height()/4),
+                scale_score=False,
+                rng=rng
+                )
+
+        all_cargo.add(_mito)
+        good_cargo.add(_mito)
+
+    # Destory original mito
+    main_mito.kill()
+
+    return all_cargo, good_cargo
+
+
+class World:
+    """
+        Complete game state for one round. step() advances it by one frame
+        from sampled player input and never touches the display, so rounds
+        can be simulated headless and replayed exactly from their seed.
+    """
+
+    def __init__(self, difficulty, seed=None, vector_physics=None, frame_timer=None, load=NORMAL_LOAD):
+        assets.set_globs(d=difficulty)
+        assets.set_image_dicts()
+        assets.warm_AP_images(MIN_AREA)
+
+        self.difficulty = difficulty
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.vector_physics = VECTOR_PHYSICS if vector_physics is None else vector_physics
+        self.frame_timer = frame_timer if frame_timer is not None else NullTimer() # Charged with the time of each part of step()
+        self.load = load
+        self.particle_quality = 1 # Share of the load's particles actually released, lowered to save frame time
+
+        self.score = 0
+        self.phago_count = 0
+        self.mouse_pressed = False
+        self.timed_out = False
+        self.phago_locs = None
+        self.start_loc = None
+        self.prev_loc = None
+        self.particle_profile = None
+        self.flash = False # Phagophore timed out this step
+
+        self.timer = 1
+        self.tick_count = 0
+        self.frame_count = 0
+
+        self.APs = pg.sprite.Group()
+        self.trapped_cargo = CargoGroup()
+        self.all_cargo, self.good_cargo = spawn_cargo(self.rng, self.vector_physics, load.cargo)
+
+        # Particles only decorate, so they draw on their own random numbers rather than the game's
+        self.particles = ParticleSystem(seed=self.rng.randrange(2 ** 32), vectorized=self.vector_physics)
+
+    @property
+    def over(self):
+        return len(self.good_cargo) < 1
+
+    def step(self, inputs):
+        """ Advance game by one frame. """
+
+        cur_loc = inputs.mouse_pos
+        self.flash = False
+
+        # Add quit option
+        if inputs.forfeit:
+            for sprite in self.all_cargo:
+                sprite.kill()
+                self.score = 0
+
+        #Handle timing
+        self.tick_count += 1
+        if self.tick_count >= TICKRATE:
+            # Chance of fission every second
+            self.all_cargo.sync()
+            self.all_cargo, self.good_cargo = fission_mito(self.all_cargo, self.good_cargo, self.rng, self.load.fission)
+
+            self.tick_count = 0
+            self.timer += 1
+
+        # Update cargo and particles
+        self.frame_timer.mark("cargo")
+        self.particles.step()
+        self.frame_timer.mark("particles")
+        self.all_cargo.update()
+        self.frame_timer.mark("cargo")
+
+        # Handle AP acceleration due to mouse dragging
+        for AP in self.APs:
+            dead_AP = AP
+            AP.handle_event(inputs.mouse_down, self.prev_loc, cur_loc)
+            AP.update()
+
+            # Purge cargo sprites and generate particle profile if AP has left screen
+            if len(self.APs) == 0:
+                self.all_cargo.sync()
+                self.score += purge_cargo(self.all_cargo)
+                self.particle_profile = ParticleProfile(dead_AP, self.rng, self.load.particles * self.particle_quality)
+
+        # Spawn particles if necessary
+        if self.particle_profile is not None and self.particle_profile.queue > 0:
+            self.particle_profile.spawn(max(1, round(2 * self.load.particles)), self.particles)
+        self.frame_timer.mark("aps")
+
+        if len(self.APs) < 1:
+            self._handle_phagophore(inputs.mouse_down, cur_loc)
+        self.frame_timer.mark("phagophore")
+
+        self.prev_loc = cur_loc
+        self.score = int(self.score)
+        self.frame_count += 1
+
+    def _handle_phagophore(self, mouse_down, cur_loc):
+        # Mouse pressed
+        if mouse_down:
+            if not self.timed_out:
+                # Initial presss
+                if not self.mouse_pressed:
+                    self.start_loc = cur_loc
+                    self.phago_locs = PhagophorePath(PATH_TOLERANCE)
+                    self.mouse_pressed = True
+
+                self.phago_locs.append(cur_loc)
+
+                # Check for phagophore drawing timeout
+                distance = get_distance(self.start_loc, cur_loc)
+                if self.phago_locs.samples >= TIMEOUT_THRESH[self.difficulty]:
+                    if distance >= HIT_CIRCLE_RADIUS:
+                        _pill = Pill(score_val=TIMEOUT_PENALTY, rng=self.rng)
+                        self.all_cargo.add(_pill)
+                        self.flash = True
+                    # If the circle was completed
+                    else:
+                        self._close_phagophore()
+
+                    self.timed_out = True
+                    self.start_loc, self.phago_locs = None, None
+
+        # Mouse released
+        else:
+            if self.timed_out:
+                self.timed_out = False
+                self.mouse_pressed = False
+            # Initial release
+            elif self.mouse_pressed and not self.timed_out:
+                # If the circle was completed
+                distance = get_distance(self.start_loc, cur_loc)
+                if distance >= HIT_CIRCLE_RADIUS:
+                    self.score -= MISS_PENALTY
+                    self.phago_count += 1
+                # If circle was not completed
+                else:
+                    self._close_phagophore()
+
+                self.start_loc, self.phago_locs = None, None
+                self.mouse_pressed = False
+
+    def _close_phagophore(self):
+        """ Form AP from the drawn phagophore and trap the cargo inside. """
+
+        AP = Autophagosome(self.phago_locs)
+        if AP.area > MIN_AREA:
+            self.APs.add(AP)
+            self.phago_count += 1
+            self.all_cargo.sync()
+            self.trapped_cargo = check_trapped(self.APs, self.all_cargo)
+
+
+def read_load(path=None, **overrides):
+    """
+        Workload scaling from an optional JSON config file, with any overrides
+        that are not None applied on top. Returns the load and the frame limit
+        given in the file, if any.
+    """
+
+    settings = {}
+    if path is not None:
+        with open(path, "r") as in_file:
+            settings = json.load(in_file)
+        if not isinstance(settings, dict):
+            raise ValueError(f"{path} must hold a JSON object of stress settings")
+
+    frames = settings.pop("frames", None)
+    unknown = set(settings) - set(Load._fields)
+    if unknown:
+        raise ValueError(f"unknown stress settings in {path}: {', '.join(sorted(unknown))}")
+
+    invalid = [name for name, value in settings.items() if isinstance(value, bool) or not isinstance(value, (int, float))]
+    if invalid or not (frames is None or (isinstance(frames, int) and not isinstance(frames, bool))):
+        raise ValueError(f"stress settings in {path} must be numbers (frames a whole number): {', '.join(sorted(invalid)) or 'frames'}")
+
+    settings.update({name: value for name, value in overrides.items() if value is not None})
+    return NORMAL_LOAD._replace(**settings), frames
+
+
+def set_globs(w=None, h=None):
+    global WIDTH
+    global HEIGHT
+
+    WIDTH = WIDTH if w is None else w
+    HEIGHT = HEIGHT if h is None else h